@@ -0,0 +1,54 @@
+"""Compare the JSON and binary position formats: bytes per update and encode/decode cost.
+
+    python bench_protocol.py [--players 32] [--number 20000]
+"""
+import argparse
+import json
+import random
+import timeit
+import uuid
+
+import protocol
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=32, help="players per snapshot")
+    parser.add_argument("--number", type=int, default=20000, help="iterations per timing")
+    args = parser.parse_args()
+
+    ids = [str(uuid.uuid4()) for _ in range(args.players)]
+    states = [(i, random.uniform(-50, 50), random.uniform(0, 20), random.uniform(0, 120))
+              for i in range(args.players)]
+
+    slot, x, y, z = states[0]
+    pos_json = {'type': 'pos', 'id': ids[0], 'x': x, 'y': y, 'z': z}
+    snap_json = {'type': 'snapshot', 'players': [
+        {'type': 'pos', 'id': ids[s], 'x': x, 'y': y, 'z': z} for s, x, y, z in states
+    ]}
+
+    json_pos = json.dumps(pos_json)
+    json_snap = json.dumps(snap_json)
+    bin_pos = protocol.encode_pos(slot, x, y, z)
+    bin_snap = protocol.encode_snapshot(states)
+
+    cases = [
+        ("pos json", len(json_pos.encode()),
+         lambda: json.dumps(pos_json), lambda: json.loads(json_pos)),
+        ("pos binary", len(bin_pos),
+         lambda: protocol.encode_pos(slot, x, y, z), lambda: protocol.decode(bin_pos)),
+        (f"snapshot({args.players}) json", len(json_snap.encode()),
+         lambda: json.dumps(snap_json), lambda: json.loads(json_snap)),
+        (f"snapshot({args.players}) binary", len(bin_snap),
+         lambda: protocol.encode_snapshot(states), lambda: protocol.decode(bin_snap)),
+    ]
+
+    print(f"{'format':<24}{'bytes':>8}{'encode us':>12}{'decode us':>12}")
+    for name, size, encode, decode in cases:
+        enc = timeit.timeit(encode, number=args.number) / args.number * 1e6
+        dec = timeit.timeit(decode, number=args.number) / args.number * 1e6
+        print(f"{name:<24}{size:>8}{enc:>12.2f}{dec:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Step many headless players with random inputs and report simulation throughput.
+
+    python bench_sim.py [--players 1000] [--seconds 5]
+"""
+import argparse
+import random
+import time
+
+from level import Level
+from sim import TIMESTEP, Input, PlayerSim, World
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=5, help="simulated seconds per player")
+    parser.add_argument("--level", default="levels/parkour.json")
+    args = parser.parse_args()
+
+    world = World(Level.load(args.level))
+    players = [PlayerSim(world) for _ in range(args.players)]
+    inputs = [Input(random.uniform(-1, 1), random.uniform(-1, 1), random.uniform(0, 360), random.random() < 0.5)
+              for _ in range(64)]
+    steps = int(args.seconds / TIMESTEP)
+
+    started = time.perf_counter()
+    for n in range(steps):
+        for i, player in enumerate(players):
+            player.step(inputs[(n // 30 + i) % len(inputs)])
+    elapsed = time.perf_counter() - started
+
+    total = steps * len(players)
+    print(f"{total} steps in {elapsed:.2f}s: {total / elapsed:,.0f} steps/s, "
+          f"{total * TIMESTEP / elapsed:,.0f}x realtime across {len(players)} players")
+
+
+if __name__ == "__main__":
+    main()
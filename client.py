@@ -1,296 +1,734 @@
+import time
+STARTUP_STARTED = time.perf_counter()
+
 from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
 from ursina.shaders import lit_with_shadows_shader
-import websocket
 import threading
+import importlib
+import protocol
+from netclient import NetworkClient
+from progression import Progression
+from sim import TIMESTEP, Input, PlayerSim, World
+from level import Level
+from profiler import Profiler
+import argparse
+import os
 import uuid
+import urllib.parse
 import json
-import time
-import tkinter as tk
-from tkinter import simpledialog, colorchooser
-
-# === TKINTER LAUNCHER ===
-root = tk.Tk()
-root.withdraw()
-
-# Ask for player name
-player_name = simpledialog.askstring("Player Name", "Enter your name:") or "Player"
-
-# Ask for server IP
-SERVER_IP = simpledialog.askstring("Server IP", "Enter server IP:", initialvalue="ws://134.226.108.225:8765") or "ws://134.226.108.225:8765"
-
-# Ask for player color
-rgb_color, hex_color = colorchooser.askcolor(title="Choose your player color")
-hex_color = hex_color or "#3498db"  # Fallback if user cancels
-
-# Convert hex string to Ursina Color
-player_color = color.rgb(
-    int(hex_color[1:3], 16),
-    int(hex_color[3:5], 16),
-    int(hex_color[5:7], 16)
-)
+import re
+import bisect
+from collections import deque
+
+startup_times = {'imports': time.perf_counter() - STARTUP_STARTED}
+
+# === Launch Options ===
+# Command line beats the config file, which beats the defaults. Nothing blocks
+# before the window opens unless --prompt asks for the old dialogs; their
+# answers are saved to the config file so the next launch needs no questions.
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'client.json')
+DEFAULT_OPTIONS = {
+    'name': 'Player',
+    'server': 'ws://134.226.108.225:8765',
+    'color': '#3498db',
+    'room': 'lobby',
+    'shadows': True,
+}
+
+def prompt_options(options):
+    # Tk is only loaded when asked for; it's slow to import and start
+    import tkinter as tk
+    from tkinter import simpledialog, colorchooser
+    root = tk.Tk()
+    root.withdraw()
+    name = simpledialog.askstring("Player Name", "Enter your name:", initialvalue=options['name'])
+    server = simpledialog.askstring("Server IP", "Enter server IP:", initialvalue=options['server'])
+    _, hex_value = colorchooser.askcolor(color=options['color'], title="Choose your player color")
+    root.destroy()
+    return {
+        'name': name or options['name'],
+        'server': server or options['server'],
+        'color': hex_value or options['color'],
+    }
+
+def load_options():
+    parser = argparse.ArgumentParser(description="Parkour client")
+    parser.add_argument("--name", help="player name")
+    parser.add_argument("--server", help="server address, e.g. ws://host:8765")
+    parser.add_argument("--color", help="player colour as #rrggbb")
+    parser.add_argument("--room", help="room to join")
+    parser.add_argument("--shadows", action=argparse.BooleanOptionalAction, default=None,
+                        help="lit, shadowed rendering (slower to start)")
+    parser.add_argument("--config", default=CONFIG_PATH, help="JSON file with any of the options above")
+    parser.add_argument("--prompt", action="store_true",
+                        help="ask for name, server and colour in dialogs and save the answers")
+    args, _ = parser.parse_known_args()
+
+    options = dict(DEFAULT_OPTIONS)
+    if os.path.exists(args.config):
+        with open(args.config) as f:
+            options.update(json.load(f))
+    options.update({key: getattr(args, key) for key in DEFAULT_OPTIONS if getattr(args, key) is not None})
+    if args.prompt:
+        options.update(prompt_options(options))
+        with open(args.config, 'w') as f:
+            json.dump(options, f, indent=2)
+    return options
+
+options = load_options()
+player_name = options['name']
+SERVER_IP = options['server']
+hex_color = options['color']
+if not re.fullmatch(r'#[0-9a-fA-F]{6}', hex_color):
+    print(f"[!] Bad colour {hex_color!r}, using the default.")
+    hex_color = DEFAULT_OPTIONS['color']
+player_color = color.hex(hex_color)
+
+# NumPy is only needed once other players show up; import it off the main thread
+threading.Thread(target=importlib.import_module, args=('numpy',), daemon=True).start()
 
 # === Multiplayer Setup ===
 client_id = str(uuid.uuid4())
 
-try:
-    ws = websocket.WebSocket()
-    ws.connect(SERVER_IP)
-    print("[+] Connected to server.")
-except Exception as e:
-    print("[!] Could not connect to server:", e)
-    exit()
+SEND_RATE = 20          # max position updates per second
+MOVE_THRESHOLD = 0.02   # skip updates that moved less than this (world units)
+KEEPALIVE_INTERVAL = 5  # resend even when standing still so the server doesn't evict us as idle
+USE_BINARY = True       # ask the server for the compact binary position format
+ROOM = options['room']  # match to join; full rooms spill over into numbered instances
+
+INTERP_DELAY = 0.1        # draw remote players this many seconds in the past
+MAX_EXTRAPOLATION = 0.25  # how long to dead-reckon once packets run late
+INTERP_BUFFER = 16        # timestamped states kept per remote player
+REMOTE_TIMEOUT = 15       # drop remote players we haven't heard from for this long
+AVATAR_POOL_SIZE = 16     # avatars built up front so early joins allocate nothing
+
+current_room = ROOM
+
+def join_message():
+    # Sent again on every reconnect. Name and colour go out once per connection;
+    # position updates after this only carry id + coordinates
+    return {
+        'type': 'join',
+        'id': client_id,
+        'name': player_name,
+        'color': hex_color,
+        'binary': USE_BINARY,
+        'room': current_room
+    }
+
+def redirected_url(url, port):
+    # Sharded servers answer the join with the port of the shard that owns our room
+    parts = urllib.parse.urlsplit(url)
+    return parts._replace(netloc=f'{parts.hostname}:{port}').geturl()
 
 # === Ursina Init ===
 app = Ursina()
-Entity.default_shader = lit_with_shadows_shader
+if options['shadows']:
+    Entity.default_shader = lit_with_shadows_shader
+    DirectionalLight().look_at(Vec3(1, -1, -1))
 Sky()
-DirectionalLight().look_at(Vec3(1, -1, -1))
 window.size = (1600, 900)
+startup_times['window'] = time.perf_counter() - STARTUP_STARTED
 
 # === Global Vars ===
-platforms = []
-scoreboard = {"easy": [], "medium": [], "hard": []}
+PROFILER_WINDOW = 300   # frames kept for the F3 overlay and F4 dumps
+profiler = Profiler(PROFILER_WINDOW)
 # === Aimed Player UI Name Display ===
 aimed_player_label = Text(text='', origin=(0,0), position=(0, -0.45), scale=2, color=color.white)
 
-# === Platform Helper ===
-def create_platform(pos, color=color.white, scale=(3, 0.5, 3), name=''):
-    plat = Entity(model='cube', color=color, scale=scale, position=pos, collider='box', name=name)
-    platforms.append(plat)
-    return plat
-
-# === Layout ===
-spawn = create_platform(Vec3(0, 0, 0), color=color.azure, name='spawn')
-for i in range(1, 10):
-    create_platform(Vec3(0, 0.5 * i, i * 5), color=color.white, name=f'intro_{i}')
-
-hub_pos = Vec3(0, 5, 50)
-main_hub = create_platform(hub_pos, color=color.yellow, scale=(18, 0.5, 18), name='hub')
-
-# Decoration
-for i in range(-4, 5):
-    for j in range(-4, 5):
-        if i == 0 and j == 0:
-            continue
-        create_platform(hub_pos + Vec3(i*3, 0, j*3), color=color.gray, scale=(2.8, 0.3, 2.8))
-
-easy_start = hub_pos + Vec3(-10, 0, 15)
-medium_start = hub_pos + Vec3(0, 0, 15)
-hard_start = hub_pos + Vec3(10, 0, 15)
+# === Level Streaming ===
+# The layout lives in a level file. Only chunks near the player are built, each
+# as one combined mesh per batch, and chunks past
+# UNLOAD_RADIUS are destroyed again. The gap between the two radii keeps a chunk
+# on the edge from being rebuilt every time the player turns around, and
+# MAX_CHUNK_LOADS_PER_FRAME spreads mesh building over several frames.
+LEVEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'levels', 'parkour.json')
+LOAD_RADIUS = 40
+UNLOAD_RADIUS = 60
+STREAM_STEP = 4                 # re-check chunks after moving this far
+MAX_CHUNK_LOADS_PER_FRAME = 2
+
+level = Level.load(LEVEL_PATH)
+
+def build_batch(name, plats):
+    batch = Entity(name=name)
+    for plat in plats:
+        Entity(parent=batch, model='cube', color=getattr(color, plat.color), scale=plat.scale, position=plat.position)
+    # No collider: the simulation collides against the level file's boxes
+    batch.combine(include_normals=True)
+    return batch
+
+class LevelStreamer(Entity):
+    def __init__(self, level, target=None):
+        super().__init__()
+        self.level = level
+        self.target = target
+        self.loaded = {}          # chunk key -> list of batch entities
+        self.batch_enabled = {}   # batch name -> bool; batches not listed are shown
+        self.last_streamed = None
+        self.settled = False
+
+    def set_batch_enabled(self, name, enabled):
+        self.batch_enabled[name] = enabled
+        for batches in self.loaded.values():
+            for batch in batches:
+                if batch.name == name:
+                    batch.enabled = enabled
+
+    def load_chunk(self, chunk):
+        batches = []
+        for name, plats in chunk.batches.items():
+            batch = build_batch(name, plats)
+            batch.enabled = self.batch_enabled.get(name, True)
+            batches.append(batch)
+        self.loaded[chunk.key] = batches
+
+    def unload_chunk(self, key):
+        for batch in self.loaded.pop(key):
+            destroy(batch)
+
+    def stream(self, x, z, limit=None):
+        """Load missing chunks near (x, z), nearest first, and drop far ones."""
+        loads = 0
+        self.settled = True
+        for chunk in self.level.chunks_within(x, z, LOAD_RADIUS):
+            if chunk.key in self.loaded:
+                continue
+            if limit is not None and loads >= limit:
+                self.settled = False
+                break
+            self.load_chunk(chunk)
+            loads += 1
+        for key in list(self.loaded):
+            if self.level.chunks[key].distance(x, z) > UNLOAD_RADIUS:
+                self.unload_chunk(key)
+        self.last_streamed = (x, z)
 
-easy_lane = [create_platform(easy_start + Vec3(0, i * 1.2, i * 4), color=color.green, name='easy') for i in range(6)]
-medium_lane = [create_platform(medium_start + Vec3(0, i * 1.5, i * 4), color=color.orange, name='medium') for i in range(6)]
-hard_lane = [create_platform(hard_start + Vec3(0, i * 2, i * 5), color=color.red, name='hard') for i in range(6)]
+    def update(self):
+        if self.target is None:
+            return
+        x, z = self.target.x, self.target.z
+        if self.settled and self.last_streamed:
+            lx, lz = self.last_streamed
+            if (x - lx) ** 2 + (z - lz) ** 2 < STREAM_STEP ** 2:
+                return
+        with profiler.section('streaming'):
+            self.stream(x, z, MAX_CHUNK_LOADS_PER_FRAME)
+
+streamer = LevelStreamer(level)
+
+# === Lane Progression ===
+LANES = level.lanes
+progression = Progression(LANES)
+scoreboard = {lane: [] for lane in LANES}
+
+for lane in LANES:
+    streamer.set_batch_enabled(lane, progression.is_unlocked(lane))
+
+@progression.subscribe
+def show_unlocked_lane(event, lane):
+    if event == 'unlocked':
+        streamer.set_batch_enabled(lane, True)
 
 # === Player Controller ===
+# Physics, respawns and lane timers run in sim.PlayerSim at a fixed timestep; the
+# FirstPersonController only handles mouse look and carries the camera.
+MAX_SIM_STEPS = 10   # per frame, so a long hitch doesn't stall the game catching up
+playable = False     # set by the loading screen once the ground around spawn is built
+world = World(level)
+
+class LookController(FirstPersonController):
+    # Only the mouse look from FirstPersonController.update; its movement and
+    # ground raycasts would test the scene every frame for nothing
+    def update(self):
+        self.rotation_y += mouse.velocity[0] * self.mouse_sensitivity[1]
+        self.camera_pivot.rotation_x -= mouse.velocity[1] * self.mouse_sensitivity[0]
+        self.camera_pivot.rotation_x = clamp(self.camera_pivot.rotation_x, -90, 90)
+
 class ParkourPlayer(Entity):
     def __init__(self):
         super().__init__()
-        self.controller = FirstPersonController(model='cube', origin_y=-0.5, color=color.orange)
-        self.controller.position = spawn.position + Vec3(0, 2, 0)
-        self.velocity = Vec3(0, 0, 0)
-        self.acceleration = 20
-        self.friction = 8
-        self.gravity = 0.005
-        self.jump_force = 20
-        self.can_jump = True
-        self.checkpoint = self.controller.position
-        self.timer_running = False
-        self.timer_start = 0
-        self.lane_started = None
-        self.completed_easy = False
-        self.completed_medium = False
+        self.controller = LookController(model='cube', origin_y=-0.5, color=color.orange, gravity=0)
+        self.sim = PlayerSim(world, progression)
+        self.sim.subscribe(self.on_sim_event)
+        self.controller.position = Vec3(*self.sim.position)
+        self.accumulator = 0
 
     def update(self):
-        dt = time.dt
-
-        # Movement
-        move_input = Vec3(
-            held_keys['d'] - held_keys['a'],
-            0,
-            held_keys['w'] - held_keys['s']
-        ).normalized()
-
-        cam_forward = camera.forward
-        cam_forward.y = 0
-        cam_forward = cam_forward.normalized()
-        cam_right = Vec3(cam_forward.z, 0, -cam_forward.x)
-
-        move_dir = (cam_right * move_input.x + cam_forward * move_input.z).normalized()
-        target_velocity = move_dir * self.acceleration
-
-        self.velocity = lerp(self.velocity, target_velocity, dt * 10)
-
-        if move_input == Vec3(0,0,0):
-            self.velocity = lerp(self.velocity, Vec3(0,0,0), dt * self.friction)
-
-        self.controller.position += self.velocity * dt
-
-        # Apply gravity
-        if not self.controller.grounded:
-            self.controller.y -= self.gravity
-
-        # Jump
-        # Jump
-        if self.controller.grounded:
-            if not held_keys['space']:
-                self.can_jump = True
-            elif held_keys['space'] and self.can_jump:
-                self.controller.jump()
-                self.controller.velocity_y = self.jump_force
-                self.can_jump = False
-
-
-        # Respawn
-        if self.controller.y < -10:
+        if not playable:
+            return
+        move = Input(held_keys['d'] - held_keys['a'], held_keys['w'] - held_keys['s'],
+                     self.controller.rotation_y, bool(held_keys['space']))
+        self.accumulator = min(self.accumulator + time.dt, MAX_SIM_STEPS * TIMESTEP)
+        with profiler.section('physics'):
+            while self.accumulator >= TIMESTEP:
+                self.sim.step(move)
+                self.accumulator -= TIMESTEP
+
+        # Draw between the last two steps so motion stays smooth at any frame rate
+        self.controller.position = lerp(Vec3(*self.sim.previous), Vec3(*self.sim.position),
+                                        self.accumulator / TIMESTEP)
+        with profiler.section('send'):
+            send_position()
+
+    def on_sim_event(self, event, **details):
+        if event == 'respawned':
             print('[!] Respawning to last checkpoint.')
-            self.controller.position = self.checkpoint
-
-        send_position()
-        self.check_progress()
-
-    def start_timer(self, lane_name):
-        self.timer_running = True
-        self.timer_start = time.time()
-        self.lane_started = lane_name
-
-    def stop_timer(self):
-        if self.timer_running:
-            elapsed = round(time.time() - self.timer_start, 2)
-            self.timer_running = False
-            print(f'[TIMER] Finished {self.lane_started} in {elapsed}s')
-            scoreboard[self.lane_started].append((player_name, elapsed))
-            scoreboard[self.lane_started].sort(key=lambda x: x[1])
+            # Don't draw a streak from where the player fell
+            self.sim.previous = tuple(self.sim.position)
+        elif event == 'finished':
+            lane, elapsed = details['lane'], details['time']
+            print(f'[TIMER] Finished {lane} in {elapsed}s')
+            # Shown right away; the server's leaderboard push replaces it shortly after
+            bisect.insort(scoreboard[lane], (player_name, elapsed), key=lambda x: x[1])
             update_scoreboard()
-            self.lane_started = None
-            return elapsed
-
-    def check_progress(self):
-        pos = self.controller.position
-
-        if not self.completed_easy and distance(pos, easy_lane[-1].position) < 2:
-            self.stop_timer()
-            self.completed_easy = True
-            self.checkpoint = easy_lane[-1].position + Vec3(0, 2, 0)
-
-        if self.completed_easy and not self.completed_medium and distance(pos, medium_lane[-1].position) < 2:
-            self.stop_timer()
-            self.completed_medium = True
-            self.checkpoint = medium_lane[-1].position + Vec3(0, 2, 0)
-
-        if self.completed_medium and distance(pos, hard_lane[-1].position) < 2:
-            self.stop_timer()
-            self.checkpoint = hard_lane[-1].position + Vec3(0, 2, 0)
-
-        if not self.timer_running:
-            if not self.completed_easy and distance(pos, easy_lane[0].position) < 2:
-                self.start_timer('easy')
-            elif self.completed_easy and not self.completed_medium and distance(pos, medium_lane[0].position) < 2:
-                self.start_timer('medium')
-            elif self.completed_medium and distance(pos, hard_lane[0].position) < 2:
-                self.start_timer('hard')
+            send_finish(lane, elapsed)
 
 player = ParkourPlayer()
+streamer.target = player.controller
 
 # === Scoreboard UI ===
-scoreboard_text = Text(text='', position=(.55, .4), origin=(0, 0), scale=1.25, background=True, color=color.white)
+# One Text per line, so a new time only re-lays out the rows it changed, and
+# redraws are batched to at most SCOREBOARD_REFRESH_RATE per second.
+SCOREBOARD_RANKS = 5
+SCOREBOARD_REFRESH_RATE = 4
+
+class ScoreboardWidget(Entity):
+    def __init__(self, lanes, position=(.55, .4), text_scale=1.25):
+        super().__init__(parent=camera.ui, position=position)
+        self.lanes = lanes
+        self.dirty = False
+        self.next_refresh = 0
+
+        lines = ['[🏁 SCOREBOARD]']
+        self.rank_rows = {}   # (lane, rank) -> row index
+        for lane in lanes:
+            lines += ['', f'{lane.capitalize()}:']
+            for rank in range(SCOREBOARD_RANKS):
+                self.rank_rows[lane, rank] = len(lines)
+                lines.append('')
+
+        line_height = Text.size * text_scale
+        top = len(lines) * line_height / 2
+        Entity(parent=self, model='quad', color=color.black66, z=1,
+               scale=(.32, len(lines) * line_height + .02))
+        self.rows = [
+            Text(parent=self, text=line, origin=(-.5, .5), position=(-.14, top - i * line_height),
+                 scale=text_scale, color=color.white)
+            for i, line in enumerate(lines)
+        ]
+        self.cache = list(lines)
+
+    def refresh(self):
+        self.dirty = True
+
+    def update(self):
+        if not self.dirty or time.time() < self.next_refresh:
+            return
+        self.dirty = False
+        self.next_refresh = time.time() + 1 / SCOREBOARD_REFRESH_RATE
+
+        with profiler.section('scoreboard'):
+            self.redraw()
+
+    def redraw(self):
+        for lane in self.lanes:
+            entries = scoreboard.get(lane, [])
+            for rank in range(SCOREBOARD_RANKS):
+                line = ''
+                if rank < len(entries):
+                    name, t = entries[rank]
+                    line = f'  {rank+1}. {name} - {t:.2f}s'
+                row = self.rank_rows[lane, rank]
+                if self.cache[row] != line:
+                    self.cache[row] = line
+                    self.rows[row].text = line
+
+scoreboard_widget = ScoreboardWidget(LANES)
 
 def update_scoreboard():
-    text = '[🏁 SCOREBOARD]\n'
-    for lane in ['easy', 'medium', 'hard']:
-        text += f'\n{lane.capitalize()}:\n'
-        for i, (name, t) in enumerate(scoreboard[lane][:5]):
-            text += f'  {i+1}. {name} - {t:.2f}s\n'
-    scoreboard_text.text = text
-
-# === Lane Access Logic ===
+    scoreboard_widget.refresh()
+
+# === Profiler Overlay ===
+# F3 shows frame times, per-section costs, network rates and entity counts;
+# F4 writes the last PROFILER_WINDOW frames to profile-<time>.json and .csv.
+PROFILER_REFRESH_RATE = 4
+
+class ProfilerOverlay(Entity):
+    def __init__(self, position=(-.87, .47)):
+        super().__init__(parent=camera.ui, position=position)
+        self.text = Text(parent=self, text='', origin=(-.5, .5), scale=.9, color=color.white,
+                         background=True)
+        self.showing = False
+        self.text.enabled = False
+        self.next_refresh = 0
+
+    def input(self, key):
+        if key == 'f3':
+            self.showing = not self.showing
+            self.text.enabled = self.showing
+            self.next_refresh = 0
+        elif key == 'f4':
+            stem = time.strftime('profile-%Y%m%d-%H%M%S')
+            profiler.dump_json(stem + '.json')
+            profiler.dump_csv(stem + '.csv')
+            print(f'[📈] Wrote {stem}.json and {stem}.csv')
+
+    def update(self):
+        if not self.showing or time.time() < self.next_refresh:
+            return
+        self.next_refresh = time.time() + 1 / PROFILER_REFRESH_RATE
+
+        stats = profiler.summary()
+        frame, rates, gauges = stats['frame_ms'], stats['rates'], stats['gauges']
+        if frame['p50'] is None:
+            return
+        lines = [f"{stats['fps'] or 0:.0f} fps  frame p50 {frame['p50']:.1f} ms  p99 {frame['p99']:.1f} ms"]
+        lines += [f'  {name:<16}{ms:6.2f} ms' for name, ms in stats['sections_ms'].items()]
+        lines.append(f"net in  {rates.get('messages_in', 0):6.0f} msg/s {rates.get('bytes_in', 0) / 1024:7.1f} KiB/s")
+        lines.append(f"net out {rates.get('messages_out', 0):6.0f} msg/s {rates.get('bytes_out', 0) / 1024:7.1f} KiB/s")
+        lines.append('  '.join(f'{name} {value}' for name, value in gauges.items()))
+        self.text.text = '\n'.join(lines)
+
+profiler_overlay = ProfilerOverlay()
+
+# === Per-frame Update ===
 from ursina import Vec3
 
 def update():
-    # Lane logic
-    for plat in medium_lane:
-        plat.enabled = player.completed_easy
-    for plat in hard_lane:
-        plat.enabled = player.completed_easy and player.completed_medium
-
-    # Raycast from camera center
-    aimed_player_label.text = ''
-    hit_info = raycast(
-        camera.world_position,
-        camera.forward,
-        distance=50, 
-        ignore=[player.controller],
-        debug=False
-    )
-
-
-    if hit_info.hit:
-        for pid, data in other_players.items():
-            if hit_info.entity == data['entity']:
-                aimed_player_label.text = data['name']
-                break
-
-
-
-
-
+    profiler.frame(time.dt, counters={
+        'messages_in': net.messages_in, 'bytes_in': net.bytes_in,
+        'messages_out': net.messages_out, 'bytes_out': net.bytes_out,
+    }, gauges={
+        'remote players': len(other_players),
+        'pooled avatars': len(avatar_pool),
+        'chunks': len(streamer.loaded),
+    })
+
+    with profiler.section('network apply'):
+        apply_network_updates()
+
+    with profiler.section('aim'):
+        update_aimed_player()
+
+
+# === Aimed Player Detection ===
+# Rays are only tested against remote players' bounding spheres, vectorized over
+# one array of their positions, so the cost tracks player count, not level size.
+AIM_CHECK_RATE = 10     # checks per second
+AIM_DISTANCE = 50
+REMOTE_RADIUS = 0.5     # remote players are unit spheres
+
+next_aim_check = 0
+
+def find_aimed_player(origin, direction):
+    # Avatars stay disabled until their first position arrives, and a pooled one
+    # still sits wherever its previous owner was
+    ids = [pid for pid, remote in other_players.items() if remote['entity'].enabled]
+    if not ids:
+        return None
+    import numpy as np
+    centers = np.array([tuple(other_players[pid]['entity'].world_position) for pid in ids])
+    offsets = centers - np.array(tuple(origin))
+    along = offsets @ np.array(tuple(direction))
+    miss_sq = np.einsum('ij,ij->i', offsets, offsets) - along * along
+    hits = (along > 0) & (along <= AIM_DISTANCE) & (miss_sq <= REMOTE_RADIUS ** 2)
+    if not hits.any():
+        return None
+    return ids[int(np.argmin(np.where(hits, along, np.inf)))]
+
+def update_aimed_player():
+    global next_aim_check
+    now = time.time()
+    if now < next_aim_check:
+        return
+    next_aim_check = now + 1 / AIM_CHECK_RATE
+
+    pid = find_aimed_player(camera.world_position, camera.forward)
+    aimed_player_label.text = other_players[pid]['name'] if pid is not None else ''
 
 
 # === Multiplayer ===
 other_players = {}
 
+slot_to_player = {}   # binary slot -> player id
+my_slot = None        # set once the server accepts the binary format
+
+last_sent_pos = None
+last_sent_time = 0
+last_sent_moving = False   # whether the last update was a real move, not a rest/keepalive
+
 def send_position():
-    if ws and ws.connected:
-        try:
-            ws.send(json.dumps({
-                'type': 'pos',
-                'id': client_id,
-                'name': player_name,
-                'x': player.controller.x,
-                'y': player.controller.y,
-                'z': player.controller.z,
-                'color': hex_color  # ✅ Send hex string
-            }))
-        except Exception as e:
-            print("[!] Send error:", e)
-
-
-def listen_to_server():
-    while True:
-        try:
-            msg = ws.recv()
-            data = json.loads(msg)
-            if data['type'] == 'pos' and data['id'] != client_id:
-                pid = data['id']
-                pos = Vec3(data['x'], data['y'], data['z'])
-
-                if pid not in other_players:
-                    color_value = data.get('color', '#3498db')
-                    model = Entity(
-                        model='sphere',
-                        color=color.hex(color_value),  # ✅ this *is* valid
-                        scale=1,
-                        position=pos,
-                        collider='sphere'
-                    )
-
-
-
-                    other_players[pid] = {
-                        'entity': model,
-                        'name': data.get('name', 'Player')  # <-- Store actual name
-                    }
-                else:
-                    other_players[pid]['entity'].position = pos
-
-
-
-
-        except Exception as e:
-            print("[!] Connection error:", e)
-            break
-
-threading.Thread(target=listen_to_server, daemon=True).start()
+    global last_sent_pos, last_sent_time, last_sent_moving
+    now = time.time()
+    if now - last_sent_time < 1 / SEND_RATE:
+        return
+    pos = player.controller.position
+    moving = last_sent_pos is None or distance(pos, last_sent_pos) >= MOVE_THRESHOLD
+    # One more update once we stop, so peers see us at rest instead of
+    # extrapolating the last move until the keepalive
+    if not moving and not last_sent_moving and now - last_sent_time < KEEPALIVE_INTERVAL:
+        return
+
+    if not net.connected:
+        return   # stale positions aren't worth queueing; the next one after reconnect is
+    if my_slot is not None:
+        message = protocol.encode_pos(my_slot, pos.x, pos.y, pos.z)
+    else:
+        message = json.dumps({
+            'type': 'pos',
+            'id': client_id,
+            'x': pos.x,
+            'y': pos.y,
+            'z': pos.z
+        })
+    if net.send(message):
+        last_sent_pos = Vec3(pos)
+        last_sent_time = now
+        last_sent_moving = moving
+
+
+def send_finish(lane, elapsed):
+    # Queued even while offline so the run still reaches the leaderboard after a reconnect
+    net.send(json.dumps({'type': 'finish', 'lane': lane, 'time': elapsed}))
+
+
+# Remote avatars are recycled: departed players go back to the pool disabled,
+# and joins take from it before building anything new. No collider: aiming is
+# a ray test in find_aimed_player and nothing else hits avatars.
+def new_avatar():
+    return {
+        'entity': Entity(model='sphere', scale=1, enabled=False),
+        'name': 'Player',
+        'history': deque(maxlen=INTERP_BUFFER),   # (receive time, x, y, z)
+        'last_heard': 0
+    }
+
+avatar_pool = [new_avatar() for _ in range(AVATAR_POOL_SIZE)]
+
+def get_remote_player(pid):
+    if pid not in other_players:
+        remote = avatar_pool.pop() if avatar_pool else new_avatar()
+        remote['name'] = 'Player'
+        remote['entity'].color = color.hex('#3498db')
+        remote['last_heard'] = time.time()
+        other_players[pid] = remote
+    return other_players[pid]
+
+
+def release_remote_player(pid):
+    remote = other_players.pop(pid, None)
+    if remote is None:
+        return
+    remote['entity'].enabled = False
+    remote['history'].clear()
+    avatar_pool.append(remote)
+
+
+def apply_remote_join(data):
+    if data['id'] == client_id:
+        return
+    remote = get_remote_player(data['id'])
+    name, hex_code = data.get('name'), data.get('color')
+    remote['name'] = name if isinstance(name, str) else DEFAULT_OPTIONS['name']
+    # A malformed colour from an older server would otherwise raise inside update()
+    if not isinstance(hex_code, str) or not re.fullmatch(r'#[0-9a-fA-F]{6}', hex_code):
+        hex_code = DEFAULT_OPTIONS['color']
+    remote['entity'].color = color.hex(hex_code)
+
+
+# === Network -> render handoff ===
+# The listener thread never touches entities. It records joins and leaves in one
+# ordered list and keeps only the newest position per player; update() drains
+# both once per frame, so a leave followed by a rejoin ends with the player there.
+net_lock = threading.Lock()
+pending_presence = []   # ('join', data) and ('leave', player id) in arrival order
+pending_states = {}   # player id -> (receive time, x, y, z)
+pending_leaderboards = {}   # lane -> [[name, time], ...]
+pending_reset = False       # moved rooms: everyone we know about is gone
+next_stale_check = 0
+
+def queue_remote_join(data):
+    if 'slot' in data:
+        slot_to_player[data['slot']] = data['id']
+    with net_lock:
+        pending_presence.append(('join', data))
+
+def queue_remote_state(pid, x, y, z):
+    with net_lock:
+        pending_states[pid] = (time.time(), x, y, z)
+
+def queue_remote_leave(pid):
+    for slot, owner in list(slot_to_player.items()):
+        if owner == pid:
+            del slot_to_player[slot]
+    with net_lock:
+        # Positions from before the leave mustn't bring the avatar back
+        pending_states.pop(pid, None)
+        pending_presence.append(('leave', pid))
+
+def queue_room_change():
+    global pending_reset
+    slot_to_player.clear()
+    with net_lock:
+        # Anything still buffered belongs to the room we just left
+        pending_presence.clear()
+        pending_states.clear()
+        pending_reset = True
+
+def queue_leaderboard(data):
+    with net_lock:
+        pending_leaderboards[data['lane']] = data['top']
+
+def apply_network_updates():
+    global pending_presence, pending_states, pending_leaderboards, pending_reset
+    global next_stale_check
+    with net_lock:
+        presence, pending_presence = pending_presence, []
+        states, pending_states = pending_states, {}
+        boards, pending_leaderboards = pending_leaderboards, {}
+        reset, pending_reset = pending_reset, False
+
+    if reset:
+        for pid in list(other_players):
+            release_remote_player(pid)
+
+    if boards:
+        for lane, top in boards.items():
+            scoreboard[lane] = [(name, t) for name, t in top]
+        update_scoreboard()
+
+    for event, value in presence:
+        if event == 'join':
+            apply_remote_join(value)
+        else:
+            release_remote_player(value)
+    for pid, state in states.items():
+        if pid != client_id:
+            remote = get_remote_player(pid)
+            remote['history'].append(state)
+            remote['last_heard'] = state[0]
+            remote['entity'].enabled = True
+
+    now = time.time()
+    if now >= next_stale_check:
+        next_stale_check = now + 1
+        for pid in [pid for pid, remote in other_players.items() if now - remote['last_heard'] > REMOTE_TIMEOUT]:
+            release_remote_player(pid)
+
+    render_time = time.time() - INTERP_DELAY
+    for data in other_players.values():
+        if data['history']:
+            data['entity'].position = sample_history(data['history'], render_time)
+
+
+def sample_history(history, render_time):
+    # Interpolate between the two states around render_time, or extrapolate
+    # from the last two for up to MAX_EXTRAPOLATION when the next packet is late.
+    # Past that the player has most likely stopped, so show the last state.
+    t1, x1, y1, z1 = history[-1]
+    if render_time >= t1:
+        if len(history) < 2 or render_time - t1 > MAX_EXTRAPOLATION:
+            return Vec3(x1, y1, z1)
+        t0, x0, y0, z0 = history[-2]
+        if t1 <= t0:
+            return Vec3(x1, y1, z1)
+        k = (render_time - t1) / (t1 - t0)
+        return Vec3(x1 + (x1 - x0) * k, y1 + (y1 - y0) * k, z1 + (z1 - z0) * k)
+
+    for i in range(len(history) - 1, 0, -1):
+        t0, x0, y0, z0 = history[i - 1]
+        if t0 <= render_time:
+            t1, x1, y1, z1 = history[i]
+            k = (render_time - t0) / (t1 - t0) if t1 > t0 else 1
+            return Vec3(x0 + (x1 - x0) * k, y0 + (y1 - y0) * k, z0 + (z1 - z0) * k)
+
+    _, x, y, z = history[0]
+    return Vec3(x, y, z)
+
+
+def handle_remote_state(data):
+    if 'name' in data or 'color' in data:
+        # Older servers still attach metadata to every position update
+        queue_remote_join(data)
+    queue_remote_state(data['id'], data['x'], data['y'], data['z'])
+
+
+@profiler.timed('network receive')
+def handle_server_message(msg):
+    # Runs on the network thread; only touches the handoff buffers
+    global my_slot, current_room
+    try:
+        if isinstance(msg, bytes):
+            for slot, x, y, z in protocol.decode(msg):
+                pid = slot_to_player.get(slot)
+                if pid is not None:
+                    queue_remote_state(pid, x, y, z)
+            return
+
+        data = json.loads(msg)
+        if data['type'] == 'room':
+            queue_room_change()
+            print(f"[+] In room {data['room']}.")
+        elif data['type'] == 'redirect':
+            current_room = data.get('room', current_room)
+            net.redirect(redirected_url(net.url, data['port']))
+            print(f"[+] Moving to shard on port {data['port']}.")
+        elif data['type'] == 'welcome':
+            my_slot = data['slot']
+        elif data['type'] == 'join':
+            queue_remote_join(data)
+        elif data['type'] == 'leave':
+            queue_remote_leave(data['id'])
+        elif data['type'] == 'pos':
+            handle_remote_state(data)
+        elif data['type'] == 'leaderboard':
+            queue_leaderboard(data)
+        elif data['type'] == 'snapshot':
+            # Tick-mode servers batch every moved player into one message
+            for state in data['players']:
+                handle_remote_state(state)
+    except Exception as e:
+        print("[!] Bad message from server:", e)
+
+
+def on_connection_change(online):
+    global my_slot
+    # Slots are per connection; fall back to JSON until the next welcome
+    my_slot = None
+    if online and 'connected' not in startup_times:
+        startup_times['connected'] = time.perf_counter() - STARTUP_STARTED
+        print(f"[⏱] Connected {startup_times['connected']:.2f}s after launch")
+
+
+# === Startup ===
+# The window shows this from the first frame while the chunks around spawn are
+# built a few per frame. The connection comes up on its own threads and isn't
+# waited for: the game is playable offline and joins in whenever it connects.
+class LoadingScreen(Entity):
+    def __init__(self):
+        super().__init__(parent=camera.ui, model='quad', color=color.black, scale=(window.aspect_ratio, 1), z=-5)
+        self.label = Text(parent=camera.ui, text='Loading...', origin=(0, 0), scale=2, z=-6)
+
+    def update(self):
+        global playable
+        if 'first frame' not in startup_times:
+            startup_times['first frame'] = time.perf_counter() - STARTUP_STARTED
+        if not (streamer.settled and streamer.last_streamed):
+            status = 'connected' if net.connected else 'connecting'
+            self.label.text = f'Loading level... {len(streamer.loaded)} chunks ({status})'
+            return
+
+        playable = True
+        startup_times['playable'] = time.perf_counter() - STARTUP_STARTED
+        print('[⏱] Startup: ' + ', '.join(f'{phase} {seconds:.2f}s' for phase, seconds in dict(startup_times).items()))
+        destroy(self.label)
+        destroy(self)
+
+loading_screen = LoadingScreen()
+
+net = NetworkClient(SERVER_IP, join_message, handle_server_message, on_connection_change)
+net.start()
 
 app.run()
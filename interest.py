@@ -0,0 +1,56 @@
+"""Uniform grid for area-of-interest queries on the relay server."""
+import math
+
+
+class Grid:
+    """Buckets keys into square cells on the x/z plane for radius queries.
+
+    Height only matters for the final distance check, since the course
+    spreads out horizontally and a cell column stays small.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}      # (cx, cz) -> set of keys
+        self.positions = {}  # key -> (x, y, z)
+        self.key_cells = {}  # key -> (cx, cz)
+
+    def _cell(self, x, z):
+        return (math.floor(x / self.cell_size), math.floor(z / self.cell_size))
+
+    def update(self, key, x, y, z):
+        self.positions[key] = (x, y, z)
+        cell = self._cell(x, z)
+        old = self.key_cells.get(key)
+        if old == cell:
+            return
+        if old is not None:
+            self._discard(key, old)
+        self.cells.setdefault(cell, set()).add(key)
+        self.key_cells[key] = cell
+
+    def remove(self, key):
+        self.positions.pop(key, None)
+        cell = self.key_cells.pop(key, None)
+        if cell is not None:
+            self._discard(key, cell)
+
+    def _discard(self, key, cell):
+        bucket = self.cells[cell]
+        bucket.discard(key)
+        if not bucket:
+            del self.cells[cell]
+
+    def query(self, x, y, z, radius):
+        """Return the keys within `radius` of (x, y, z)."""
+        min_cx, min_cz = self._cell(x - radius, z - radius)
+        max_cx, max_cz = self._cell(x + radius, z + radius)
+        r2 = radius * radius
+        found = []
+        for cx in range(min_cx, max_cx + 1):
+            for cz in range(min_cz, max_cz + 1):
+                for key in self.cells.get((cx, cz), ()):
+                    px, py, pz = self.positions[key]
+                    if (px - x) ** 2 + (py - y) ** 2 + (pz - z) ** 2 <= r2:
+                        found.append(key)
+        return found
@@ -0,0 +1,70 @@
+"""Persistent per-lane leaderboard backed by SQLite.
+
+Every finished run is appended to the ``runs`` table, indexed on (lane, time),
+so loading a lane's top N is an index range scan no matter how long the
+history gets. The current top N of each lane is also kept in memory as a
+sorted list; a new run is placed with bisect and only reported when it
+actually changes that list.
+"""
+import bisect
+import sqlite3
+import time
+
+
+class Leaderboard:
+    def __init__(self, path, top_n=5, lanes=None):
+        self.top_n = top_n
+        # Sharded servers share one file; wait on each other's write locks
+        self.db = sqlite3.connect(path, timeout=10)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " id INTEGER PRIMARY KEY,"
+            " lane TEXT NOT NULL,"
+            " name TEXT NOT NULL,"
+            " time REAL NOT NULL,"
+            " finished_at REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS runs_lane_time ON runs (lane, time)")
+        self.db.commit()
+
+        self.top = {}   # lane -> sorted list of (time, name)
+        for (lane,) in self.db.execute("SELECT DISTINCT lane FROM runs"):
+            # Runs stored under lanes the level no longer has aren't served
+            if lanes is None or lane in lanes:
+                self.top[lane] = self._load(lane)
+
+    def _load(self, lane):
+        rows = self.db.execute(
+            "SELECT time, name FROM runs WHERE lane = ? ORDER BY time LIMIT ?",
+            (lane, self.top_n)
+        )
+        return [tuple(row) for row in rows]
+
+    def record(self, lane, name, elapsed):
+        """Store a run; return True when it changed the lane's top N."""
+        self.db.execute(
+            "INSERT INTO runs (lane, name, time, finished_at) VALUES (?, ?, ?, ?)",
+            (lane, name, elapsed, time.time())
+        )
+        self.db.commit()
+
+        top = self.top.setdefault(lane, [])
+        if len(top) >= self.top_n and elapsed >= top[-1][0]:
+            return False
+        bisect.insort(top, (elapsed, name))
+        del top[self.top_n:]
+        return True
+
+    def set_top(self, lane, top):
+        """Replace a lane's cached top N with [[name, time], ...] from another process."""
+        self.top[lane] = sorted((elapsed, name) for name, elapsed in top)[:self.top_n]
+
+    def message(self, lane):
+        return {
+            'type': 'leaderboard',
+            'lane': lane,
+            'top': [[name, elapsed] for elapsed, name in self.top.get(lane, [])]
+        }
+
+    def close(self):
+        self.db.close()
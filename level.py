@@ -0,0 +1,62 @@
+"""Level data loaded from a JSON file and grouped into chunks for streaming.
+
+Each platform belongs to the chunk its center falls in. A chunk keeps the x/z
+bounds of everything inside it, so a platform wider than a chunk (the hub) is
+still picked up as soon as the player gets near any part of it.
+"""
+import json
+import math
+from collections import namedtuple
+
+Platform = namedtuple('Platform', 'position scale color batch')
+
+
+class Chunk:
+    def __init__(self, key):
+        self.key = key
+        self.batches = {}   # batch name -> list of Platform
+        self.min = [math.inf, math.inf]
+        self.max = [-math.inf, -math.inf]
+
+    def add(self, plat):
+        self.batches.setdefault(plat.batch, []).append(plat)
+        for axis, i in ((0, 0), (1, 2)):
+            half = plat.scale[i] / 2
+            self.min[axis] = min(self.min[axis], plat.position[i] - half)
+            self.max[axis] = max(self.max[axis], plat.position[i] + half)
+
+    def distance(self, x, z):
+        """Horizontal distance from (x, z) to the chunk's bounds, 0 when inside."""
+        dx = max(self.min[0] - x, 0, x - self.max[0])
+        dz = max(self.min[1] - z, 0, z - self.max[1])
+        return math.hypot(dx, dz)
+
+
+class Level:
+    def __init__(self, data):
+        self.spawn = tuple(data['spawn'])
+        self.lanes = list(data['lanes'])
+        self.zones = data.get('zones', [])
+        self.chunk_size = data.get('chunk_size', 32)
+        self.platforms = [
+            Platform((x, y, z), (sx, sy, sz), color, batch)
+            for x, y, z, sx, sy, sz, color, batch in data['platforms']
+        ]
+        self.chunks = {}    # (cx, cz) -> Chunk
+        for plat in self.platforms:
+            key = self.chunk_of(plat.position[0], plat.position[2])
+            self.chunks.setdefault(key, Chunk(key)).add(plat)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def chunk_of(self, x, z):
+        return (math.floor(x / self.chunk_size), math.floor(z / self.chunk_size))
+
+    def chunks_within(self, x, z, radius):
+        """Chunks with any platform within radius of (x, z), nearest first."""
+        near = [chunk for chunk in self.chunks.values() if chunk.distance(x, z) <= radius]
+        near.sort(key=lambda chunk: chunk.distance(x, z))
+        return near
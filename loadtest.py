@@ -0,0 +1,281 @@
+"""Headless load generator and relay latency benchmark for server.py.
+
+Opens N websocket bots that join like the game client and send `pos` updates at
+a fixed rate. Every bot also listens, so each relayed update is matched back to
+its send time to measure end-to-end latency. Needs only `websockets`, no
+display and no Ursina.
+
+    python loadtest.py --bots 50 --rate 20 --duration 30 --spawn --output report.json
+    python loadtest.py --url ws://host:8765 --server-pid 1234 --binary
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import struct
+import subprocess
+import sys
+import time
+import urllib.parse
+import uuid
+
+import websockets
+
+import protocol
+
+CIRCLE_STEPS = 2000   # positions per lap; keeps (id, x, z) unique long enough to match
+SENT_TTL = 10         # seconds a send time is kept waiting for its relays
+
+
+def f32(value):
+    # Round through float32 so JSON and binary relays yield the same key
+    return struct.unpack('<f', struct.pack('<f', value))[0]
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def read_stat(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        return f.read().rsplit(')', 1)[1].split()
+
+
+def cpu_seconds(pid):
+    # utime + stime of the process and its children, in seconds, so a
+    # sharded server's worker processes are counted too
+    pids = [pid]
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                if int(read_stat(entry)[1]) == pid:
+                    pids.append(int(entry))
+            except OSError:
+                pass
+    ticks = 0
+    for p in pids:
+        try:
+            fields = read_stat(p)
+        except OSError:
+            continue
+        ticks += int(fields[11]) + int(fields[12])
+    return ticks / os.sysconf('SC_CLK_TCK')
+
+
+class Stats:
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.errors = 0
+        self.latencies = []
+        self.send_times = {}   # (player id, x, z) -> perf_counter at send
+        self.recording = False
+
+
+class Bot:
+    def __init__(self, index, args, stats):
+        self.id = str(uuid.uuid4())
+        self.args = args
+        self.stats = stats
+        self.slots = {}   # binary slot -> player id
+        cols = max(1, int(math.sqrt(args.bots)))
+        self.base = (index % cols * args.spread, 1.0, index // cols * args.spread)
+        self.step = random.randrange(CIRCLE_STEPS)
+
+    def next_position(self):
+        self.step += 1
+        angle = 2 * math.pi * self.step / CIRCLE_STEPS
+        bx, by, bz = self.base
+        return f32(bx + math.cos(angle)), by, f32(bz + math.sin(angle))
+
+    async def run(self, stop):
+        url = self.args.url
+        while url is not None:
+            self.redirect = None
+            async with websockets.connect(url, max_size=None) as ws:
+                await ws.send(self.join_message())
+                tasks = [asyncio.create_task(self.receive(ws)),
+                         asyncio.create_task(self.send_loop(ws, stop))]
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in tasks:
+                    task.cancel()
+                for task in done:
+                    task.result()
+            # A sharded server's router answers the join with the shard to use
+            url = self.redirect
+
+    def join_message(self):
+        return json.dumps({
+            'type': 'join',
+            'id': self.id,
+            'name': f'bot-{self.id[:8]}',
+            'color': '#888888',
+            'binary': self.args.binary
+        })
+
+    def handle_json(self, data):
+        if data['type'] == 'join' and 'slot' in data:
+            self.slots[data['slot']] = data['id']
+
+    async def send_loop(self, ws, stop):
+        interval = 1 / self.args.rate
+        next_send = time.perf_counter() + random.uniform(0, interval)
+        while not stop.is_set():
+            await asyncio.sleep(max(0, next_send - time.perf_counter()))
+            next_send += interval
+            x, y, z = self.next_position()
+            # Same shape the game client's send_position() produces
+            message = json.dumps({'type': 'pos', 'id': self.id, 'x': x, 'y': y, 'z': z})
+            if self.stats.recording:
+                self.stats.send_times[self.id, x, z] = time.perf_counter()
+                self.stats.sent += 1
+                self.stats.bytes_sent += len(message)
+            await ws.send(message)
+
+    async def receive(self, ws):
+        async for message in ws:
+            now = time.perf_counter()
+            if isinstance(message, bytes):
+                states = [(self.slots.get(slot), x, z) for slot, x, _, z in protocol.decode(message)]
+            else:
+                data = json.loads(message)
+                self.handle_json(data)
+                if data['type'] == 'redirect':
+                    parts = urllib.parse.urlsplit(self.args.url)
+                    self.redirect = parts._replace(netloc=f"{parts.hostname}:{data['port']}").geturl()
+                    return
+                if data['type'] == 'pos':
+                    states = [(data['id'], data['x'], data['z'])]
+                elif data['type'] == 'snapshot':
+                    states = [(s['id'], s['x'], s['z']) for s in data['players']]
+                else:
+                    continue
+            if not self.stats.recording:
+                continue
+            self.stats.bytes_received += len(message)
+            for pid, x, z in states:
+                if pid == self.id:
+                    continue
+                self.stats.received += 1
+                sent_at = self.stats.send_times.get((pid, x, z))
+                if sent_at is not None:
+                    self.stats.latencies.append(now - sent_at)
+
+
+async def prune(stats, stop):
+    while not stop.is_set():
+        await asyncio.sleep(1)
+        cutoff = time.perf_counter() - SENT_TTL
+        stats.send_times = {k: t for k, t in stats.send_times.items() if t >= cutoff}
+
+
+async def wait_for_server(url, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with websockets.connect(url):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def run(args):
+    server = None
+    pid = args.server_pid
+    if args.spawn:
+        port = args.url.rsplit(':', 1)[1].split('/')[0]
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server.py'),
+             '--host', '127.0.0.1', '--port', port, '--leaderboard', '', *args.server_args.split()],
+            stdout=subprocess.DEVNULL
+        )
+        pid = server.pid
+
+    try:
+        await wait_for_server(args.url)
+        stats = Stats()
+        stop = asyncio.Event()
+        bots = [Bot(i, args, stats) for i in range(args.bots)]
+        tasks = [asyncio.create_task(bot.run(stop)) for bot in bots]
+        tasks.append(asyncio.create_task(prune(stats, stop)))
+
+        await asyncio.sleep(args.warmup)
+        stats.recording = True
+        cpu_start = cpu_seconds(pid) if pid else None
+        started = time.perf_counter()
+        await asyncio.sleep(args.duration)
+        elapsed = time.perf_counter() - started
+        cpu_used = cpu_seconds(pid) - cpu_start if pid else None
+        stats.recording = False
+
+        stop.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        stats.errors = sum(isinstance(r, Exception) for r in results)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    latencies = sorted(round(t * 1000, 3) for t in stats.latencies)
+    return {
+        'config': {
+            'url': args.url,
+            'bots': args.bots,
+            'rate': args.rate,
+            'duration': args.duration,
+            'binary': args.binary,
+            'spread': args.spread,
+            'server_args': args.server_args,
+        },
+        'elapsed': round(elapsed, 3),
+        'sent': stats.sent,
+        'received': stats.received,
+        'sent_per_s': round(stats.sent / elapsed, 1),
+        'received_per_s': round(stats.received / elapsed, 1),
+        'bytes_sent_per_s': round(stats.bytes_sent / elapsed),
+        'bytes_received_per_s': round(stats.bytes_received / elapsed),
+        'latency_ms': {
+            'samples': len(latencies),
+            'p50': percentile(latencies, 50),
+            'p90': percentile(latencies, 90),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1] if latencies else None,
+        },
+        'server_cpu_percent': round(cpu_used / elapsed * 100, 1) if cpu_used is not None else None,
+        'bot_errors': stats.errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the parkour relay server")
+    parser.add_argument("--url", default="ws://127.0.0.1:8765")
+    parser.add_argument("--bots", type=int, default=32)
+    parser.add_argument("--rate", type=float, default=20, help="pos updates per bot per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to measure")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds before measuring")
+    parser.add_argument("--spread", type=float, default=3, help="distance between bots' home positions")
+    parser.add_argument("--binary", action="store_true", help="negotiate the binary wire format")
+    parser.add_argument("--spawn", action="store_true", help="start a local server.py for the run")
+    parser.add_argument("--server-args", default="", help="extra arguments for a spawned server")
+    parser.add_argument("--server-pid", type=int, help="measure CPU of an already running server")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Server counters with a Prometheus text rendering and a periodic summary line."""
+import time
+
+
+class Metrics:
+    COUNTERS = {
+        'messages_in': "Messages received from clients",
+        'messages_out': "Frames queued to clients",
+        'bytes_in': "Bytes received from clients",
+        'dropped_clients': "Clients dropped for stalled sends or idling",
+        'encode_seconds': "Time spent encoding outgoing messages",
+        'rejected_moves': "Position updates with malformed or out-of-range coordinates",
+        'clamped_moves': "Position updates clamped by movement validation",
+        'rejected_finishes': "Lane finishes rejected after impossible movement",
+    }
+
+    def __init__(self):
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self._last = {name: 0 for name in self.COUNTERS}
+        self._last_time = time.monotonic()
+
+    def prometheus(self, gauges):
+        """Counters and the given {name: (help, value)} gauges in Prometheus text format."""
+        lines = []
+        for name, help_text in self.COUNTERS.items():
+            lines += [f"# HELP parkour_{name}_total {help_text}",
+                      f"# TYPE parkour_{name}_total counter",
+                      f"parkour_{name}_total {getattr(self, name)}"]
+        for name, (help_text, value) in gauges.items():
+            lines += [f"# HELP parkour_{name} {help_text}",
+                      f"# TYPE parkour_{name} gauge",
+                      f"parkour_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def summary(self, gauges):
+        """One line of per-second rates since the previous call, plus the gauges."""
+        now = time.monotonic()
+        elapsed = max(now - self._last_time, 1e-9)
+        rates = {name: (getattr(self, name) - self._last[name]) / elapsed for name in self.COUNTERS}
+        self._last = {name: getattr(self, name) for name in self.COUNTERS}
+        self._last_time = now
+        parts = [
+            f"in {rates['messages_in']:.0f}/s",
+            f"out {rates['messages_out']:.0f}/s",
+            f"{rates['bytes_in'] / 1024:.1f} KiB/s in",
+            f"encode {rates['encode_seconds'] * 1000:.1f} ms/s",
+            f"dropped {self.dropped_clients}",
+            f"clamped {self.clamped_moves}",
+        ]
+        parts += [f"{name} {value:g}" for name, (_, value) in gauges.items()]
+        return ", ".join(parts)
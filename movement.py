@@ -0,0 +1,91 @@
+"""Server-side movement validation for every player in one vectorized pass per tick.
+
+Positions are proposed as they arrive and checked together on the next tick.
+Each player can move horizontally no faster than the current speed plus
+max_accel * dt, capped at max_speed. Vertical movement has separate rise and
+fall limits. Moves over the limit are clamped and the player is flagged. The
+only allowed jump is a respawn: from below the level onto a known respawn point.
+"""
+import numpy as np
+
+MAX_SPEED = 30        # horizontal units/s; players top out around 20
+MAX_ACCEL = 150       # horizontal units/s^2
+MAX_RISE = 25         # units/s upwards
+MAX_FALL = 100        # units/s downwards
+SLACK = 0.5           # units of jitter forgiven on every move
+MAX_DT = 0.5          # a player standing still doesn't bank more than this much movement
+RESPAWN_RADIUS = 1.0  # how close to a respawn point a respawn has to land
+
+
+class MovementValidator:
+    def __init__(self, capacity, min_dt=0.05, respawn_points=(), respawn_below=-10):
+        self.min_dt = min_dt
+        self.respawn_points = np.array(respawn_points, dtype=np.float64).reshape(-1, 3)
+        self.respawn_below = respawn_below
+
+        # Indexed by binary slot
+        self.position = np.zeros((capacity, 3))
+        self.time = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+        self.known = np.zeros(capacity, dtype=bool)
+        self.proposed = np.zeros((capacity, 3))
+        self.proposed_time = np.zeros(capacity)
+        self.pending = np.zeros(capacity, dtype=bool)
+        self.violations = np.zeros(capacity, dtype=np.int64)
+        self.last_violation = np.full(capacity, -np.inf)
+
+    def propose(self, slot, x, y, z, now):
+        """Queue a position for the next step; later proposals replace earlier ones."""
+        self.proposed[slot] = (x, y, z)
+        self.proposed_time[slot] = now
+        self.pending[slot] = True
+
+    def forget(self, slot):
+        self.known[slot] = False
+        self.pending[slot] = False
+        self.speed[slot] = 0
+        self.violations[slot] = 0
+        self.last_violation[slot] = -np.inf
+
+    def flagged_since(self, slot, since):
+        return bool(self.last_violation[slot] >= since)
+
+    def step(self):
+        """Check every pending proposal and return (slots, accepted positions, clamped mask)."""
+        slots = np.flatnonzero(self.pending)
+        self.pending[slots] = False
+        if not slots.size:
+            return slots, np.empty((0, 3)), np.empty(0, dtype=bool)
+
+        new = self.proposed[slots]
+        prev = self.position[slots]
+        now = self.proposed_time[slots]
+        dt = np.clip(now - self.time[slots], self.min_dt, MAX_DT)
+        delta = new - prev
+
+        # Horizontal: scale the move back onto the allowed radius
+        horizontal = np.hypot(delta[:, 0], delta[:, 2])
+        limit = np.minimum(MAX_SPEED, self.speed[slots] + MAX_ACCEL * dt) * dt + SLACK
+        scale = np.minimum(1, limit / np.maximum(horizontal, 1e-9))
+        delta[:, 0] *= scale
+        delta[:, 2] *= scale
+        vertical = np.clip(delta[:, 1], -MAX_FALL * dt - SLACK, MAX_RISE * dt + SLACK)
+        clamped = (scale < 1) | (vertical != delta[:, 1])
+        delta[:, 1] = vertical
+
+        # First positions and respawns are taken as they are
+        exempt = ~self.known[slots]
+        if len(self.respawn_points):
+            fell = prev[:, 1] < self.respawn_below
+            gaps = np.linalg.norm(new[:, None, :] - self.respawn_points[None, :, :], axis=2)
+            exempt |= fell & (gaps.min(axis=1) <= RESPAWN_RADIUS)
+        clamped &= ~exempt
+        accepted = np.where(exempt[:, None], new, prev + delta)
+
+        self.speed[slots] = np.where(exempt, 0, np.hypot(delta[:, 0], delta[:, 2]) / dt)
+        self.position[slots] = accepted
+        self.time[slots] = now
+        self.known[slots] = True
+        self.violations[slots] += clamped
+        self.last_violation[slots[clamped]] = now[clamped]
+        return slots, accepted, clamped
@@ -0,0 +1,115 @@
+"""Background websocket connection for the game client.
+
+The render loop only ever calls send(), which drops the message into a bounded
+queue and returns. A reader thread owns connecting, re-joining and receiving; a
+writer thread drains the queue. Lost connections are retried with exponential
+backoff, and the join message is sent again on every (re)connect.
+"""
+import json
+import queue
+import random
+import threading
+
+import websocket
+
+CONNECT_TIMEOUT = 5
+MIN_BACKOFF = 0.5
+MAX_BACKOFF = 10
+
+
+class NetworkClient:
+    def __init__(self, url, join_message, on_message, on_status=None, max_queue=256):
+        self.url = url
+        self.join_message = join_message   # called on every connect for the join dict
+        self.on_message = on_message       # called on the reader thread with each frame
+        self.on_status = on_status         # called with True/False as the link goes up/down
+        self.outbox = queue.Queue(maxsize=max_queue)
+        self.ws = None
+        self.online = threading.Event()
+        # Running totals for the client profiler, kept by the network threads
+        self.messages_in = self.bytes_in = 0
+        self.messages_out = self.bytes_out = 0
+
+    @property
+    def connected(self):
+        return self.online.is_set()
+
+    def start(self):
+        threading.Thread(target=self._read_loop, daemon=True).start()
+        threading.Thread(target=self._write_loop, daemon=True).start()
+
+    def send(self, message):
+        """Queue a str (text frame) or bytes (binary frame); never blocks."""
+        try:
+            self.outbox.put_nowait(message)
+            return True
+        except queue.Full:
+            return False
+
+    def redirect(self, url):
+        """Reconnect to `url` straight away, e.g. when the server moves us to another shard."""
+        self.url = url
+        ws = self.ws
+        if ws is not None:
+            ws.close()
+
+    def _set_online(self, online):
+        if online == self.online.is_set():
+            return
+        if online:
+            self.online.set()
+        else:
+            self.online.clear()
+        if self.on_status:
+            self.on_status(online)
+
+    def _read_loop(self):
+        backoff = MIN_BACKOFF
+        while True:
+            url = self.url
+            try:
+                ws = websocket.WebSocket()
+                ws.connect(url, timeout=CONNECT_TIMEOUT)
+                ws.settimeout(None)
+                join = json.dumps(self.join_message())
+                ws.send(join)
+                self.messages_out += 1
+                self.bytes_out += len(join)
+                self.ws = ws
+                self._set_online(True)
+                print(f"[+] Connected to {url}.")
+                backoff = MIN_BACKOFF
+                while True:
+                    message = ws.recv()
+                    self.messages_in += 1
+                    self.bytes_in += len(message)
+                    self.on_message(message)
+            except Exception as e:
+                if url == self.url:
+                    print(f"[!] Connection error: {e}; retrying in {backoff:.1f}s")
+            finally:
+                self._set_online(False)
+                self.ws = None
+
+            if url != self.url:
+                continue   # redirected: connect to the new address without waiting
+            threading.Event().wait(backoff * random.uniform(0.8, 1.2))
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+    def _write_loop(self):
+        while True:
+            message = self.outbox.get()
+            self.online.wait()
+            ws = self.ws
+            if ws is None:
+                continue
+            try:
+                if isinstance(message, bytes):
+                    ws.send_binary(message)
+                else:
+                    ws.send(message)
+                self.messages_out += 1
+                self.bytes_out += len(message)
+            except Exception as e:
+                print("[!] Send error:", e)
+                ws.close()
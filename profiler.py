@@ -0,0 +1,110 @@
+"""Rolling frame-time profiler with named sections, counter rates and gauges.
+
+Call frame() once per frame. Any section() timed in between, on any thread,
+counts toward that frame. Counters are cumulative totals (messages, bytes)
+sampled each frame and reported as per-second rates over the window. Gauges
+are plain current values such as the number of remote players.
+"""
+import csv
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+class Profiler:
+    def __init__(self, window=300):
+        self.frames = deque(maxlen=window)    # (timestamp, frame seconds, {section: seconds})
+        self.samples = deque(maxlen=window)   # (timestamp, {counter: total})
+        self.gauges = {}
+        self.sections = []                    # section names in first-seen order
+        self.current = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def section(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def timed(self, name):
+        """Decorator form of section()."""
+        def decorate(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.section(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def add(self, name, seconds):
+        with self.lock:
+            if name not in self.current and name not in self.sections:
+                self.sections.append(name)
+            self.current[name] = self.current.get(name, 0) + seconds
+
+    def frame(self, dt, counters=None, gauges=None):
+        now = time.monotonic()
+        with self.lock:
+            sections, self.current = self.current, {}
+        self.frames.append((now, dt, sections))
+        if counters is not None:
+            self.samples.append((now, dict(counters)))
+        if gauges is not None:
+            self.gauges.update(gauges)
+
+    def rates(self):
+        if len(self.samples) < 2:
+            return {}
+        (start, first), (end, last) = self.samples[0], self.samples[-1]
+        span = max(end - start, 1e-9)
+        return {name: (total - first.get(name, 0)) / span for name, total in last.items()}
+
+    def summary(self):
+        frame_ms = sorted(dt * 1000 for _, dt, _ in self.frames)
+        count = len(self.frames)
+        span = self.frames[-1][0] - self.frames[0][0] if count > 1 else 0
+        sections = {
+            name: sum(s.get(name, 0) for _, _, s in self.frames) / max(count, 1) * 1000
+            for name in self.sections
+        }
+        return {
+            'frames': count,
+            'fps': (count - 1) / span if span else None,
+            'frame_ms': {
+                'avg': sum(frame_ms) / count if count else None,
+                'p50': percentile(frame_ms, 50),
+                'p99': percentile(frame_ms, 99),
+                'max': frame_ms[-1] if frame_ms else None,
+            },
+            'sections_ms': sections,
+            'rates': self.rates(),
+            'gauges': dict(self.gauges),
+        }
+
+    def dump_json(self, path):
+        with open(path, 'w') as f:
+            json.dump({
+                'summary': self.summary(),
+                'frames': [{'time': t, 'frame_ms': dt * 1000,
+                            **{name: s * 1000 for name, s in sections.items()}}
+                           for t, dt, sections in self.frames],
+            }, f, indent=2)
+
+    def dump_csv(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['time', 'frame_ms'] + [f'{name}_ms' for name in self.sections])
+            for t, dt, sections in self.frames:
+                writer.writerow([f'{t:.4f}', f'{dt * 1000:.3f}'] +
+                                [f'{sections.get(name, 0) * 1000:.3f}' for name in self.sections])
@@ -0,0 +1,44 @@
+"""Lane unlock state with change notifications.
+
+Lanes unlock in order: finishing one opens the next. Subscribers are called as
+``callback(event, lane)`` with ``event`` being ``'completed'`` or ``'unlocked'``,
+and only when something actually changes.
+"""
+
+
+class Progression:
+    def __init__(self, lanes):
+        self.lanes = list(lanes)
+        self.completed = set()
+        self.listeners = []
+
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+        return callback
+
+    def emit(self, event, lane):
+        for callback in list(self.listeners):
+            callback(event, lane)
+
+    def is_completed(self, lane):
+        return lane in self.completed
+
+    def is_unlocked(self, lane):
+        index = self.lanes.index(lane)
+        return index == 0 or self.lanes[index - 1] in self.completed
+
+    def current(self):
+        """The first lane not finished yet; the last lane stays current so it can be re-run."""
+        for lane in self.lanes:
+            if lane not in self.completed:
+                return lane
+        return self.lanes[-1]
+
+    def complete(self, lane):
+        if lane in self.completed:
+            return
+        self.completed.add(lane)
+        self.emit('completed', lane)
+        index = self.lanes.index(lane)
+        if index + 1 < len(self.lanes):
+            self.emit('unlocked', self.lanes[index + 1])
@@ -0,0 +1,51 @@
+"""Compact binary wire format for position traffic.
+
+JSON stays the default. A client opts in by sending ``'binary': True`` in its
+join message; the server answers with a ``welcome`` message holding the
+client's slot, a small integer that stands in for the UUID player id. Every
+``join`` the server sends includes the slot, so clients can map slots back to
+player ids.
+
+Frames are little-endian and start with a one-byte message type:
+
+    POS       type:u8 slot:u16 x:f32 y:f32 z:f32            (15 bytes)
+    SNAPSHOT  type:u8 count:u16 then count * (slot:u16 x:f32 y:f32 z:f32)
+"""
+import struct
+
+POS = 1
+SNAPSHOT = 2
+
+MAX_SLOTS = 0xFFFF
+
+_pos = struct.Struct('<BHfff')
+_header = struct.Struct('<BH')
+_entry = struct.Struct('<Hfff')
+
+
+def encode_pos(slot, x, y, z):
+    return _pos.pack(POS, slot, x, y, z)
+
+
+def encode_snapshot(entries):
+    """Pack an iterable of (slot, x, y, z) tuples into one snapshot frame."""
+    entries = list(entries)
+    buf = bytearray(_header.size + _entry.size * len(entries))
+    _header.pack_into(buf, 0, SNAPSHOT, len(entries))
+    offset = _header.size
+    for entry in entries:
+        _entry.pack_into(buf, offset, *entry)
+        offset += _entry.size
+    return bytes(buf)
+
+
+def decode(data):
+    """Return a list of (slot, x, y, z) tuples from a POS or SNAPSHOT frame."""
+    kind = data[0]
+    if kind == POS:
+        _, slot, x, y, z = _pos.unpack(data)
+        return [(slot, x, y, z)]
+    if kind == SNAPSHOT:
+        _, count = _header.unpack_from(data)
+        return list(_entry.iter_unpack(data[_header.size:_header.size + count * _entry.size]))
+    raise ValueError(f"unknown binary message type {kind}")
@@ -0,0 +1,89 @@
+"""Append-only binary log of inbound server traffic, for replaying real sessions.
+
+Each record is a fixed header followed by the raw payload:
+
+    <d  wall-clock timestamp
+    I   connection number, unique within one recording session
+    B   kind: CONNECT, TEXT, BINARY or DISCONNECT
+    I   payload length
+
+The event loop only puts tuples on a queue. A background thread packs them and
+writes them out in batches, so recording never blocks message handling.
+"""
+import queue
+import struct
+import threading
+import time
+
+HEADER = struct.Struct('<dIBI')
+CONNECT, TEXT, BINARY, DISCONNECT = range(4)
+
+
+class Recorder:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'ab')
+        self.queue = queue.SimpleQueue()
+        self.numbers = {}   # server client id -> connection number
+        self.next_number = 0
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+
+    def connect(self, client_id):
+        self.numbers[client_id] = self.next_number
+        self.next_number += 1
+        self.queue.put((time.time(), self.numbers[client_id], CONNECT, b''))
+
+    def message(self, client_id, message):
+        kind = BINARY if isinstance(message, bytes) else TEXT
+        self.queue.put((time.time(), self.numbers[client_id], kind, message))
+
+    def disconnect(self, client_id):
+        number = self.numbers.pop(client_id, None)
+        if number is not None:
+            self.queue.put((time.time(), number, DISCONNECT, b''))
+
+    def close(self):
+        """Write out everything still queued and close the file."""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def _write_loop(self):
+        while True:
+            batch = [self.queue.get()]
+            # Drain whatever else piled up so a burst costs one write
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            chunks = []
+            done = False
+            for item in batch:
+                if item is None:
+                    done = True
+                    break
+                stamp, number, kind, payload = item
+                if kind == TEXT:
+                    payload = payload.encode()
+                chunks += [HEADER.pack(stamp, number, kind, len(payload)), payload]
+            self.file.write(b''.join(chunks))
+            self.file.flush()
+            if done:
+                self.file.close()
+                return
+
+
+def read(path):
+    """Yield (timestamp, connection, kind, payload) records; TEXT payloads come back as str."""
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            stamp, number, kind, length = HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                return   # cut off mid-record, e.g. the server was killed
+            yield stamp, number, kind, payload.decode() if kind == TEXT else payload
@@ -0,0 +1,198 @@
+"""Replay a session recorded with `server.py --record` against a server.
+
+Every recorded connection gets its own websocket, and its messages are sent in
+their original order. At --speed 1 the original timing is kept. --speed 0 sends
+everything as fast as the server takes it. A separate probe connection pings the
+server throughout, so the report shows throughput and how responsive the server
+stayed under that exact traffic.
+
+    python replay.py session.rec --spawn --server-args "--tick-rate 20"
+    python replay.py session.rec --url ws://host:8765 --speed 0 --server-pid 1234
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import websockets
+
+import recording
+from loadtest import cpu_seconds, percentile, wait_for_server
+
+PROBE_INTERVAL = 0.1   # seconds between probe pings
+
+
+class Stats:
+    def __init__(self):
+        self.sent = 0
+        self.bytes_sent = 0
+        self.received = 0
+        self.bytes_received = 0
+        self.pings = []
+        self.probe_reconnects = 0
+        self.errors = 0
+
+
+async def drain(ws, stats):
+    # Keep reading so the server never sees a stalled client and drops it
+    try:
+        async for message in ws:
+            stats.received += 1
+            stats.bytes_received += len(message)
+    except websockets.ConnectionClosed:
+        pass
+
+
+async def probe(url, stats, stop):
+    # Protocol pings don't count as activity on the server, so each ping also
+    # carries a message the server ignores; otherwise long replays get the probe
+    # evicted as idle. A dropped probe reconnects rather than losing the report.
+    while not stop.is_set():
+        try:
+            async with websockets.connect(url) as ws:
+                reader = asyncio.create_task(drain(ws, Stats()))
+                while not stop.is_set():
+                    await ws.send(json.dumps({'type': 'probe'}))
+                    started = time.perf_counter()
+                    await (await ws.ping())
+                    stats.pings.append(time.perf_counter() - started)
+                    await asyncio.sleep(PROBE_INTERVAL)
+                reader.cancel()
+        except (websockets.ConnectionClosed, OSError):
+            stats.probe_reconnects += 1
+            await asyncio.sleep(PROBE_INTERVAL)
+
+
+async def replay(args, records, stats):
+    sockets = {}   # connection number -> (websocket, reader task)
+    loop = asyncio.get_running_loop()
+    first = records[0][0]
+    offset = 0          # recorded seconds squashed out of long gaps
+    previous = first
+    started = loop.time()
+
+    async def close(number):
+        ws, reader = sockets.pop(number)
+        await ws.close()
+        await reader
+
+    for stamp, number, kind, payload in records:
+        offset += max(0, stamp - previous - args.max_gap)
+        previous = stamp
+        if args.speed:
+            delay = started + (stamp - first - offset) / args.speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        if kind == recording.CONNECT:
+            if number in sockets:
+                await close(number)   # numbers restart with every recording session
+            ws = await websockets.connect(args.url, max_queue=None)
+            sockets[number] = (ws, asyncio.create_task(drain(ws, stats)))
+        elif kind == recording.DISCONNECT:
+            if number in sockets:
+                await close(number)
+        elif number in sockets:
+            try:
+                await sockets[number][0].send(payload)
+                stats.sent += 1
+                stats.bytes_sent += len(payload)
+            except websockets.ConnectionClosed:
+                stats.errors += 1
+
+    for number in list(sockets):
+        await close(number)
+
+
+async def run(args):
+    records = list(recording.read(args.log))
+    if not records:
+        raise SystemExit(f"{args.log} holds no records")
+
+    server = None
+    pid = args.server_pid
+    if args.spawn:
+        port = args.url.rsplit(':', 1)[1].split('/')[0]
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server.py'),
+             '--host', '127.0.0.1', '--port', port, '--leaderboard', '', *args.server_args.split()],
+            stdout=subprocess.DEVNULL
+        )
+        pid = server.pid
+
+    try:
+        await wait_for_server(args.url)
+        stats = Stats()
+        stop = asyncio.Event()
+        prober = asyncio.create_task(probe(args.url, stats, stop))
+        cpu_start = cpu_seconds(pid) if pid else None
+        started = time.perf_counter()
+        await replay(args, records, stats)
+        elapsed = time.perf_counter() - started
+        cpu_used = cpu_seconds(pid) - cpu_start if pid else None
+        stop.set()
+        await prober
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    pings = sorted(round(t * 1000, 3) for t in stats.pings)
+    return {
+        'config': {
+            'log': args.log,
+            'url': args.url,
+            'speed': args.speed,
+            'max_gap': args.max_gap,
+            'server_args': args.server_args,
+        },
+        'records': len(records),
+        'connections': sum(kind == recording.CONNECT for _, _, kind, _ in records),
+        'recorded_seconds': round(records[-1][0] - records[0][0], 3),
+        'elapsed': round(elapsed, 3),
+        'sent': stats.sent,
+        'received': stats.received,
+        'sent_per_s': round(stats.sent / elapsed, 1),
+        'received_per_s': round(stats.received / elapsed, 1),
+        'bytes_sent_per_s': round(stats.bytes_sent / elapsed),
+        'bytes_received_per_s': round(stats.bytes_received / elapsed),
+        'ping_ms': {
+            'samples': len(pings),
+            'p50': percentile(pings, 50),
+            'p90': percentile(pings, 90),
+            'p99': percentile(pings, 99),
+            'max': pings[-1] if pings else None,
+        },
+        'probe_reconnects': stats.probe_reconnects,
+        'server_cpu_percent': round(cpu_used / elapsed * 100, 1) if cpu_used is not None else None,
+        'send_errors': stats.errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded session against the parkour server")
+    parser.add_argument("log", help="file written by server.py --record")
+    parser.add_argument("--url", default="ws://127.0.0.1:8765")
+    parser.add_argument("--speed", type=float, default=1,
+                        help="playback speed relative to the recording (0 = as fast as possible)")
+    parser.add_argument("--max-gap", type=float, default=5,
+                        help="squash quiet stretches longer than this many seconds")
+    parser.add_argument("--spawn", action="store_true", help="start a local server.py for the run")
+    parser.add_argument("--server-args", default="", help="extra arguments for a spawned server")
+    parser.add_argument("--server-pid", type=int, help="measure CPU of an already running server")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,381 @@
+import argparse
 import asyncio
+import atexit
+import math
+import multiprocessing
+import os
+import re
+import signal
+import threading
+import time
+import zlib
 import websockets
 import json
 
+import protocol
+from interest import Grid
+from leaderboard import Leaderboard
+from level import Level
+from metrics import Metrics
+from recording import Recorder
+
+# Bytes allowed to queue in a client's outgoing buffer before broadcasts skip it
+SEND_BUFFER_LIMIT = 64 * 1024
+# Consecutive skipped broadcasts before a stalled client gets dropped
+MAX_SKIPPED_SENDS = 100
+# Snapshot rate in Hz; 0 relays every pos message the moment it arrives
+TICK_RATE = 0
+# Players farther apart than this only hear about each other every FAR_UPDATE_INTERVAL
+# seconds; 0 sends every update to everyone
+AOI_RADIUS = 0
+FAR_UPDATE_INTERVAL = 1.0
+# SQLite file holding every finished run; empty disables the shared leaderboard
+LEADERBOARD_PATH = "leaderboard.db"
+# Rooms are placed on shards by name, so everyone in a room shares one process
+DEFAULT_ROOM = "lobby"
+# Players per room instance; a full room spills over into "<room>#2", "<room>#3", ...
+ROOM_CAPACITY = 32
+MAX_ROOM_NAME = 32
+MAX_PLAYER_NAME = 24
+COLOR_PATTERN = re.compile(r'#[0-9a-fA-F]{6}')
+# Protocol-level pings; a client that misses a pong for PING_TIMEOUT seconds is closed
+PING_INTERVAL = 10
+PING_TIMEOUT = 10
+# Clients that send nothing for this long are evicted even if they still answer pings
+IDLE_TIMEOUT = 30
+# Seconds between stats lines on stdout; 0 only serves /metrics
+STATS_INTERVAL = 0
+ROUTER_TIMEOUT = 10   # seconds the router waits for a client's first message
+# Coordinates beyond this are rejected outright, whether or not moves are validated
+WORLD_LIMIT = 10000
+# Level file giving the lanes finishes may be recorded for, and the validator's respawn points
+LEVEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels", "parkour.json")
+# Respawns are only allowed once a player has fallen this far below the lowest platform
+RESPAWN_MARGIN = 5
+
 clients = {}
+rooms = {}       # instance name -> Room
+players = {}     # player id -> the Client currently playing as it
+free_slots = []  # binary slots given back by departed clients
+next_slot = 0
+leaderboard = None
+lanes = set()    # lane names from the level file
+shard_inboxes = []   # one queue per shard for cross-shard messages (sharded mode)
+shard_index = None
+shard_count = 0
+router_port = None
+validator = None     # MovementValidator when --validate is on
+pending_moves = {}   # slot -> Client with a position waiting for the next tick
+recorder = None      # Recorder when --record is on
+metrics = Metrics()
+
+class Room:
+    def __init__(self, name, base):
+        self.name = name
+        self.base = base
+        self.clients = {}    # client id -> Client
+        self.players = {}    # player id -> latest position state
+        self.dirty = set()   # player ids that moved since the last snapshot
+        self.grid = Grid(AOI_RADIUS) if AOI_RADIUS else None
+
+class Client:
+    def __init__(self, client_id, websocket):
+        self.id = client_id
+        self.ws = websocket
+        self.skipped = 0
+        self.player_id = None
+        self.name = 'Player'
+        self.color = '#3498db'
+        self.slot = None
+        self.binary = False
+        self.next_far_update = 0
+        self.room = None
+        self.last_seen = time.monotonic()
+
+def drop_client(client, reason):
+    # The handler's finally block does the room/slot cleanup once the socket is gone
+    if clients.get(client.id) is client:
+        print(f"[-] Dropping client {client.id}: {reason}")
+        metrics.dropped_clients += 1
+    client.ws.transport.abort()
+
+def broadcast(message, exclude=None, binary=None, recipients=None):
+    # Encode once, hand the same frame to every peer without awaiting any of them.
+    # Peers whose send buffer is backed up are skipped so they can't stall the room.
+    # Clients that negotiated the binary format get `binary` instead of the JSON text.
+    targets = []
+    binary_targets = []
+    if recipients is None:
+        recipients = list(clients.values())
+    for client in recipients:
+        if client.id == exclude:
+            continue
+        if client.ws.transport.get_write_buffer_size() > SEND_BUFFER_LIMIT:
+            client.skipped += 1
+            if client.skipped >= MAX_SKIPPED_SENDS:
+                drop_client(client, "send buffer stalled")
+            continue
+        client.skipped = 0
+        if binary is not None and client.binary:
+            binary_targets.append(client.ws)
+        else:
+            targets.append(client.ws)
+    websockets.broadcast(targets, message)
+    if binary_targets:
+        websockets.broadcast(binary_targets, binary)
+    metrics.messages_out += len(targets) + len(binary_targets)
+
+def allocate_slot():
+    global next_slot
+    if free_slots:
+        return free_slots.pop()
+    if next_slot >= protocol.MAX_SLOTS:
+        raise RuntimeError("out of binary slots")
+    next_slot += 1
+    return next_slot - 1
+
+def join_message(client):
+    return {
+        'type': 'join',
+        'id': client.player_id,
+        'name': client.name,
+        'color': client.color,
+        'slot': client.slot
+    }
+
+def find_room(base):
+    number = 1
+    while True:
+        name = base if number == 1 else f"{base}#{number}"
+        room = rooms.get(name)
+        if room is None:
+            room = rooms[name] = Room(name, base)
+            print(f"[🚪] Opened room {name}")
+        if len(room.clients) < ROOM_CAPACITY:
+            return room
+        number += 1
+
+async def enter_room(client, base):
+    if client.room is not None and client.room.base == base:
+        return
+    leave_room(client)
+    room = find_room(base)
+    room.clients[client.id] = client
+    client.room = room
+    await client.ws.send(json.dumps({'type': 'room', 'room': room.name}))
+
+    # Catch the newcomer up on everyone already here, including players standing still
+    for other in list(room.clients.values()):
+        if other is client or other.player_id is None:
+            continue
+        await client.ws.send(json.dumps(join_message(other)))
+        if other.player_id in room.players:
+            await client.ws.send(json.dumps(room.players[other.player_id]))
+
+    broadcast(json.dumps(join_message(client)), exclude=client.id, recipients=list(room.clients.values()))
+
+def leave_room(client):
+    room = client.room
+    if room is None:
+        return
+    client.room = None
+    del room.clients[client.id]
+    if room.grid is not None:
+        room.grid.remove(client.id)
+    if players.get(client.player_id) is not client:
+        # Someone else plays as this id now; their state and presence stay
+        if not room.clients:
+            del rooms[room.name]
+            print(f"[🚪] Closed room {room.name}")
+        return
+    room.players.pop(client.player_id, None)
+    room.dirty.discard(client.player_id)
+    if room.clients:
+        broadcast(json.dumps({'type': 'leave', 'id': client.player_id}), recipients=list(room.clients.values()))
+    else:
+        del rooms[room.name]
+        print(f"[🚪] Closed room {room.name}")
+
+async def handle_join(client, data):
+    base = data.get('room') or (client.room.base if client.room else DEFAULT_ROOM)
+    if not isinstance(base, str) or len(base) > MAX_ROOM_NAME:
+        print(f"[!] Invalid room from {client.id}: {data}")
+        return
+    if shard_count and shard_for(base, shard_count) != shard_index:
+        # Another shard owns this room; the client reconnects there and joins again
+        await client.ws.send(json.dumps({
+            'type': 'redirect',
+            'port': router_port + 1 + shard_for(base, shard_count),
+            'room': base
+        }))
+        return
+
+    if client.player_id is not None and client.player_id != data['id']:
+        release_player(client)
+    previous = players.get(data['id'])
+    if previous is not None and previous is not client:
+        # Same player on a new connection, e.g. reconnecting before the old socket
+        # timed out: the old connection gives up the id before the new one takes it
+        release_player(previous)
+        previous.player_id = None
+        drop_client(previous, "replaced by a new connection")
+    client.player_id = data['id']
+    players[client.player_id] = client
+    # Relayed to every client in the room, so anything malformed keeps the old value
+    name, color = data.get('name'), data.get('color')
+    if isinstance(name, str) and 0 < len(name) <= MAX_PLAYER_NAME:
+        client.name = name
+    if isinstance(color, str) and COLOR_PATTERN.fullmatch(color):
+        client.color = color
+    if client.slot is None:
+        client.slot = allocate_slot()
+
+    if data.get('binary'):
+        client.binary = True
+        await client.ws.send(json.dumps({'type': 'welcome', 'slot': client.slot, 'binary': True}))
+
+    if client.room is not None and client.room.base == base:
+        # Metadata change from an older client: just re-announce it
+        broadcast(json.dumps(join_message(client)), exclude=client.id,
+                  recipients=list(client.room.clients.values()))
+    else:
+        await enter_room(client, base)
+
+def handle_pos(client, x, y, z):
+    if client.room is None:
+        return
+    if not all(isinstance(v, (int, float)) and math.isfinite(v) and abs(v) <= WORLD_LIMIT for v in (x, y, z)):
+        metrics.rejected_moves += 1
+        return
+    if validator is not None:
+        # Checked together with everyone else's on the next tick
+        validator.propose(client.slot, x, y, z, time.monotonic())
+        pending_moves[client.slot] = client
+        return
+    update_position(client, x, y, z)
+
+def update_position(client, x, y, z):
+    room = client.room
+    payload = {
+        'type': 'pos',
+        'id': client.player_id,
+        'x': x,
+        'y': y,
+        'z': z
+    }
+    room.players[client.player_id] = payload
+
+    if room.grid is not None:
+        room.grid.update(client.id, x, y, z)
+
+    if TICK_RATE:
+        room.dirty.add(client.player_id)
+        return
+
+    recipients = list(room.clients.values())
+    if room.grid is not None:
+        now = time.monotonic()
+        if now >= client.next_far_update:
+            client.next_far_update = now + FAR_UPDATE_INTERVAL
+        else:
+            near = set(room.grid.query(x, y, z, AOI_RADIUS))
+            # Clients that haven't reported a position yet still receive everything
+            recipients = [other for cid, other in room.clients.items()
+                          if cid in near or cid not in room.grid.positions]
+    started = time.perf_counter()
+    text = json.dumps(payload)
+    packed = protocol.encode_pos(client.slot, x, y, z)
+    metrics.encode_seconds += time.perf_counter() - started
+    broadcast(text, exclude=client.id, binary=packed, recipients=recipients)
+
+def handle_finish(client, data):
+    lane, elapsed = data.get('lane'), data.get('time')
+    if not isinstance(lane, str) or lane not in lanes or isinstance(elapsed, bool) or \
+            not isinstance(elapsed, (int, float)) or not math.isfinite(elapsed) or not elapsed > 0:
+        print(f"[!] Invalid finish from {client.id}: {data}")
+        return
+    if validator is not None and validator.flagged_since(client.slot, time.monotonic() - elapsed):
+        # A move got clamped somewhere in this run
+        print(f"[!] Rejected finish from {client.id}: impossible movement during the run")
+        metrics.rejected_finishes += 1
+        return
+    if leaderboard.record(lane, client.name, float(elapsed)):
+        message = json.dumps(leaderboard.message(lane))
+        broadcast(message)
+        # The leaderboard is the only state shared across rooms, so it's the
+        # only thing other shards need to hear about
+        forward_to_shards(message)
+
+def release_player(client):
+    leave_room(client)
+    if validator is not None and client.slot is not None:
+        validator.forget(client.slot)
+        pending_moves.pop(client.slot, None)
+    if client.slot is not None:
+        free_slots.append(client.slot)
+        client.slot = None
+    if players.get(client.player_id) is client:
+        del players[client.player_id]
 
 async def handle_client(websocket):
     client_id = str(id(websocket))
-    clients[client_id] = websocket
+    client = Client(client_id, websocket)
+    clients[client_id] = client
     print(f"[+] Client connected: {client_id}")
+    if recorder is not None:
+        recorder.connect(client_id)
 
     try:
+        if leaderboard is not None:
+            for lane in leaderboard.top:
+                await websocket.send(json.dumps(leaderboard.message(lane)))
+
         async for message in websocket:
+            client.last_seen = time.monotonic()
+            if recorder is not None:
+                recorder.message(client_id, message)
+            metrics.messages_in += 1
+            metrics.bytes_in += len(message)
             try:
+                if isinstance(message, bytes):
+                    if client.player_id is None:
+                        continue
+                    for _, x, y, z in protocol.decode(message):
+                        handle_pos(client, x, y, z)
+                    continue
+
                 data = json.loads(message)
 
-                if data.get("type") == "pos":
+                if data.get("type") == "join":
+                    if 'id' not in data:
+                        print(f"[!] Invalid join from {client_id}: {data}")
+                        continue
+                    await handle_join(client, data)
+
+                elif data.get("type") == "pos":
                     if not all(k in data for k in ('id', 'x', 'y', 'z')):
                         print(f"[!] Invalid position data from {client_id}: {data}")
                         continue
 
-                    payload = {
-                        'type': 'pos',
-                        'id': data['id'],
-                        'name': data.get('name', 'Player'),
-                        'x': data['x'],
-                        'y': data['y'],
-                        'z': data['z'],
-                        'color': data.get('color', '#3498db')  # include color
-                    }
-
-                    disconnected = []
-
-                    for other_id, other_ws in clients.items():
-                        if other_id != client_id:
-                            try:
-                                await other_ws.send(json.dumps(payload))
-                            except Exception as e:
-                                print(f"[!] Failed to send to {other_id}: {e}")
-                                disconnected.append(other_id)
-
-                    for d in disconnected:
-                        if d in clients:
-                            del clients[d]
-                            print(f"[-] Cleaned up dead client: {d}")
+                    # Older clients never send 'join' and attach name/colour to every update
+                    if client.player_id != data['id'] or \
+                            data.get('name', client.name) != client.name or \
+                            data.get('color', client.color) != client.color:
+                        await handle_join(client, data)
+
+                    handle_pos(client, data['x'], data['y'], data['z'])
+
+                elif data.get("type") == "join_room":
+                    if client.player_id is not None:
+                        await handle_join(client, {'id': client.player_id, 'room': data.get('room')})
+
+                elif data.get("type") == "leave_room":
+                    leave_room(client)
+                    await websocket.send(json.dumps({'type': 'room', 'room': None}))
+
+                elif data.get("type") == "finish":
+                    if leaderboard is not None and client.player_id is not None:
+                        handle_finish(client, data)
 
             except json.JSONDecodeError:
                 print(f"[!] JSON decode error from {client_id}")
@@ -53,13 +386,281 @@ async def handle_client(websocket):
         print(f"[!] Client {client_id} connection closed with error: {e}")
 
     finally:
-        if client_id in clients:
-            del clients[client_id]
+        if clients.pop(client_id, None) is not None:
             print(f"[-] Client disconnected: {client_id}")
+        if recorder is not None:
+            recorder.disconnect(client_id)
+        if client.player_id is not None:
+            release_player(client)
+
+async def tick_loop():
+    # One combined snapshot per room per tick holding every player that moved since the
+    # last one. Senders get their own entry back too; clients already skip their own id.
+    loop = asyncio.get_running_loop()
+    interval = 1 / TICK_RATE
+    next_tick = loop.time()
+    while True:
+        next_tick += interval
+        await asyncio.sleep(max(0, next_tick - loop.time()))
+        # A failure is logged and skipped so one bad room can't stop the tick for everyone
+        if validator is not None:
+            try:
+                validate_moves()
+            except Exception as e:
+                print(f"[!] Error validating moves: {e}")
+        for room in list(rooms.values()):
+            if not room.dirty:
+                continue
+            try:
+                moved = [room.players[pid] for pid in room.dirty if pid in room.players]
+                room.dirty.clear()
+                if room.grid is None:
+                    send_snapshot(moved, list(room.clients.values()))
+                else:
+                    send_filtered_snapshots(room, moved)
+            except Exception as e:
+                room.dirty.clear()
+                print(f"[!] Error sending snapshot for room {room.name}: {e}")
+
+def validate_moves():
+    # The checks run over every pending move at once; only the accepted results
+    # are applied one player at a time
+    slot_ids, positions, clamped = validator.step()
+    metrics.clamped_moves += int(clamped.sum())
+    for slot, (x, y, z) in zip(slot_ids.tolist(), positions.tolist()):
+        client = pending_moves.pop(slot, None)
+        if client is not None and client.slot == slot and client.room is not None:
+            update_position(client, x, y, z)
+
+def send_snapshot(states, recipients):
+    started = time.perf_counter()
+    text = json.dumps({'type': 'snapshot', 'players': states})
+    packed = protocol.encode_snapshot(
+        (players[state['id']].slot, state['x'], state['y'], state['z']) for state in states
+    )
+    metrics.encode_seconds += time.perf_counter() - started
+    broadcast(text, binary=packed, recipients=recipients)
+
+def send_filtered_snapshots(room, moved):
+    # Each client gets the moved players near it, plus any far player whose
+    # low-rate update is due this tick. Clients with no position yet get everything.
+    now = time.monotonic()
+    moved_ids = {state['id'] for state in moved}
+    owners = {}
+    far_due = set()
+    for client in list(room.clients.values()):
+        if client.player_id is not None:
+            owners[client.id] = client.player_id
+            if client.player_id in moved_ids and now >= client.next_far_update:
+                client.next_far_update = now + FAR_UPDATE_INTERVAL
+                far_due.add(client.player_id)
+
+    grid = room.grid
+    for client in list(room.clients.values()):
+        if client.id not in grid.positions:
+            states = moved
+        else:
+            near = {owners.get(cid) for cid in grid.query(*grid.positions[client.id], AOI_RADIUS)}
+            states = [state for state in moved if state['id'] in near or state['id'] in far_due]
+        if states:
+            send_snapshot(states, [client])
+
+# === Liveness and Metrics ===
+async def evict_idle_clients():
+    while True:
+        await asyncio.sleep(1)
+        cutoff = time.monotonic() - IDLE_TIMEOUT
+        for client in list(clients.values()):
+            if client.last_seen < cutoff:
+                drop_client(client, f"idle for {IDLE_TIMEOUT}s")
+
+def gauges():
+    buffered = [client.ws.transport.get_write_buffer_size() for client in clients.values()]
+    latencies = [client.ws.latency for client in clients.values() if client.ws.latency]
+    return {
+        'connected_clients': ("Open client connections", len(clients)),
+        'rooms': ("Open room instances", len(rooms)),
+        'send_buffer_bytes': ("Bytes queued across all client send buffers", sum(buffered)),
+        'send_buffer_max_bytes': ("Largest single client send buffer", max(buffered, default=0)),
+        'ping_seconds': ("Mean websocket ping round trip",
+                         round(sum(latencies) / len(latencies), 4) if latencies else 0),
+    }
+
+def serve_metrics(connection, request):
+    # Plain HTTP GET /metrics on the game port returns Prometheus text
+    if request.path == "/metrics":
+        return connection.respond(200, metrics.prometheus(gauges()))
+    return None
+
+async def print_stats():
+    while True:
+        await asyncio.sleep(STATS_INTERVAL)
+        print(f"[📊] {metrics.summary(gauges())}")
+
+# === Sharding ===
+def shard_for(room, shards):
+    return zlib.crc32(room.encode()) % shards
+
+def forward_to_shards(message):
+    for i, inbox in enumerate(shard_inboxes):
+        if i != shard_index:
+            inbox.put(message)
 
-async def main():
-    server = await websockets.serve(handle_client, "0.0.0.0", 8765)
-    print("[🌐] Server running on ws://0.0.0.0:8765")
+def receive_forwarded(message):
+    data = json.loads(message)
+    if data['type'] == 'leaderboard' and leaderboard is not None:
+        leaderboard.set_top(data['lane'], data['top'])
+    broadcast(message)
+
+def watch_inbox(loop, inbox):
+    while True:
+        message = inbox.get()
+        loop.call_soon_threadsafe(receive_forwarded, message)
+
+async def route_client(websocket, args):
+    # Clients that join get told which shard owns their room and reconnect there.
+    # Older clients that never join are proxied to the default room's shard.
+    try:
+        first = await asyncio.wait_for(websocket.recv(), ROUTER_TIMEOUT)
+        data = json.loads(first)
+    except Exception:
+        return
+    shard = shard_for(DEFAULT_ROOM, args.shards)
+    if data.get('type') == 'join':
+        room = data.get('room') or DEFAULT_ROOM
+        shard = shard_for(room, args.shards)
+        await websocket.send(json.dumps({'type': 'redirect', 'port': args.port + 1 + shard, 'room': room}))
+        return
+
+    async with websockets.connect(f"ws://127.0.0.1:{args.port + 1 + shard}") as upstream:
+        await upstream.send(first)
+
+        async def pump(source, sink):
+            async for message in source:
+                await sink.send(message)
+
+        pumps = [asyncio.create_task(pump(websocket, upstream)),
+                 asyncio.create_task(pump(upstream, websocket))]
+        await asyncio.wait(pumps, return_when=asyncio.FIRST_COMPLETED)
+        for task in pumps:
+            task.cancel()
+
+def run_shard(args, index, inboxes):
+    global shard_inboxes, shard_index, shard_count, router_port
+    shard_inboxes = inboxes
+    shard_index = index
+    shard_count = args.shards
+    router_port = args.port
+    asyncio.run(serve(args, args.port + 1 + index))
+
+async def run_router(args):
+    inboxes = [multiprocessing.Queue() for _ in range(args.shards)]
+    workers = [
+        multiprocessing.Process(target=run_shard, args=(args, i, inboxes), daemon=True)
+        for i in range(args.shards)
+    ]
+    for worker in workers:
+        worker.start()
+
+    server = await websockets.serve(lambda ws: route_client(ws, args), args.host, args.port)
+    print(f"[🌐] Router running on ws://{args.host}:{args.port} "
+          f"for {args.shards} shards on ports {args.port + 1}-{args.port + args.shards}")
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, server.close)
+    try:
+        await server.wait_closed()
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+
+# === Startup ===
+def configure(args):
+    global TICK_RATE, AOI_RADIUS, FAR_UPDATE_INTERVAL, ROOM_CAPACITY, IDLE_TIMEOUT, STATS_INTERVAL, leaderboard, validator, recorder, lanes
+
+    TICK_RATE = args.tick_rate
+    AOI_RADIUS = args.aoi_radius
+    FAR_UPDATE_INTERVAL = args.far_interval
+    ROOM_CAPACITY = args.room_capacity
+    IDLE_TIMEOUT = args.idle_timeout
+    STATS_INTERVAL = args.stats_interval
+    level = Level.load(args.level)
+    lanes = set(level.lanes)
+    if args.leaderboard:
+        leaderboard = Leaderboard(args.leaderboard, lanes=lanes)
+    if args.record:
+        # Each shard keeps its own log so writers never interleave
+        path = args.record if shard_index is None else f"{args.record}.{shard_index}"
+        recorder = Recorder(path)
+        atexit.register(recorder.close)
+    if args.validate:
+        # NumPy is only needed when validation is on
+        from movement import MovementValidator
+        lowest = min(plat.position[1] - plat.scale[1] / 2 for plat in level.platforms)
+        respawns = [level.spawn] + [zone['checkpoint'] for zone in level.zones]
+        validator = MovementValidator(protocol.MAX_SLOTS, min_dt=1 / TICK_RATE,
+                                      respawn_points=respawns, respawn_below=lowest - RESPAWN_MARGIN)
+
+async def serve(args, port):
+    configure(args)
+    server = await websockets.serve(handle_client, args.host, port, process_request=serve_metrics,
+                                    ping_interval=PING_INTERVAL, ping_timeout=PING_TIMEOUT)
+    print(f"[🌐] Server running on ws://{args.host}:{port} (metrics on http://{args.host}:{port}/metrics)")
+    asyncio.create_task(evict_idle_clients())
+    if STATS_INTERVAL:
+        asyncio.create_task(print_stats())
+    if TICK_RATE:
+        print(f"[⏱] Snapshot tick at {TICK_RATE:g} Hz")
+        asyncio.create_task(tick_loop())
+    if AOI_RADIUS:
+        print(f"[👁] Area of interest radius {AOI_RADIUS:g}, far updates every {FAR_UPDATE_INTERVAL:g}s")
+    if recorder is not None:
+        print(f"[⏺] Recording inbound traffic to {recorder.path}")
+    if validator is not None:
+        print(f"[🛡] Validating movement against {args.level}")
+    if leaderboard is not None:
+        print(f"[🏁] Leaderboard stored in {args.leaderboard}")
+    if shard_inboxes:
+        threading.Thread(target=watch_inbox, args=(asyncio.get_running_loop(), shard_inboxes[shard_index]),
+                         daemon=True).start()
     await server.wait_closed()
 
-asyncio.run(main())
+def main():
+    parser = argparse.ArgumentParser(description="Parkour relay server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tick-rate", type=float, default=TICK_RATE,
+                        help="send combined snapshots at this rate in Hz (0 = relay every message)")
+    parser.add_argument("--aoi-radius", type=float, default=AOI_RADIUS,
+                        help="only send full-rate updates between players this close (0 = everyone)")
+    parser.add_argument("--far-interval", type=float, default=FAR_UPDATE_INTERVAL,
+                        help="seconds between updates for players outside the AOI radius")
+    parser.add_argument("--leaderboard", default=LEADERBOARD_PATH,
+                        help="SQLite file for the shared leaderboard (empty string disables it)")
+    parser.add_argument("--room-capacity", type=int, default=ROOM_CAPACITY,
+                        help="players per room instance before a new instance is opened")
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT,
+                        help="evict clients that send nothing for this many seconds")
+    parser.add_argument("--stats-interval", type=float, default=STATS_INTERVAL,
+                        help="print a stats line every N seconds (0 = off)")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="run this many worker processes on the following ports behind a router")
+    parser.add_argument("--record", metavar="PATH",
+                        help="append every inbound message to this log for replay.py")
+    parser.add_argument("--validate", action="store_true",
+                        help="check player speed and acceleration every tick (needs --tick-rate and NumPy)")
+    parser.add_argument("--level", default=LEVEL_PATH,
+                        help="level file with the lanes to keep times for and the spawn and checkpoints players may respawn at")
+    args = parser.parse_args()
+    if args.validate and not args.tick_rate:
+        parser.error("--validate needs --tick-rate")
+
+    if args.shards:
+        asyncio.run(run_router(args))
+    else:
+        asyncio.run(serve(args, args.port))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""Headless player simulation: movement, gravity, jumping, respawns and lane timers.
+
+Everything here is plain Python stepped at a fixed timestep with scripted
+inputs, so it runs without a display. The client drives one PlayerSim from the
+keyboard and renders its position. Tests and bots can step as many as they
+like. Level geometry is the platform boxes from the level file, looked up
+through a uniform grid so a step only tests the platforms under the player.
+
+    world = World(Level.load('levels/parkour.json'))
+    player = PlayerSim(world)
+    for _ in range(600):
+        player.step(Input(move_z=1))
+"""
+import math
+from collections import namedtuple
+
+from progression import Progression
+from triggers import TriggerSystem, Zone
+
+TIMESTEP = 1 / 60
+ACCELERATION = 20      # horizontal top speed in units/s
+RESPONSIVENESS = 10    # how quickly velocity follows the input
+FRICTION = 8           # extra slow-down with no input
+GRAVITY = 32
+JUMP_HEIGHT = 2
+JUMP_VELOCITY = math.sqrt(2 * GRAVITY * JUMP_HEIGHT)
+MAX_FALL_SPEED = 50
+STEP_HEIGHT = 0.5      # ledges this close above the feet are stepped onto
+GROUND_SNAP = 0.1      # how far below the feet still counts as standing
+PLAYER_HEIGHT = 2
+RESPAWN_Y = -10
+GRID_CELL = 8
+
+# move_x/move_z in -1..1 relative to the facing direction, yaw in degrees
+Input = namedtuple('Input', 'move_x move_z yaw jump', defaults=(0, 0, 0, False))
+
+
+class World:
+    """Level geometry and trigger zones, shared by every simulated player."""
+
+    def __init__(self, level):
+        self.level = level
+        self.spawn = tuple(level.spawn)
+        self.lanes = set(level.lanes)
+        self.cells = {}   # (cx, cz) -> list of (min_x, min_y, min_z, max_x, max_y, max_z, batch)
+        for plat in level.platforms:
+            box = tuple(p - s / 2 for p, s in zip(plat.position, plat.scale)) + \
+                  tuple(p + s / 2 for p, s in zip(plat.position, plat.scale)) + (plat.batch,)
+            for cx in range(math.floor(box[0] / GRID_CELL), math.floor(box[3] / GRID_CELL) + 1):
+                for cz in range(math.floor(box[2] / GRID_CELL), math.floor(box[5] / GRID_CELL) + 1):
+                    self.cells.setdefault((cx, cz), []).append(box)
+
+        self.triggers = TriggerSystem()
+        for zone in level.zones:
+            self.triggers.add(Zone(zone['center'], zone['size'], kind=zone['kind'], lane=zone['lane'],
+                                   checkpoint=tuple(zone['checkpoint'])))
+
+    def boxes_at(self, x, z, progression=None):
+        """Boxes under (x, z); lane batches still locked in `progression` aren't solid."""
+        for box in self.cells.get((math.floor(x / GRID_CELL), math.floor(z / GRID_CELL)), ()):
+            if box[0] <= x <= box[3] and box[2] <= z <= box[5]:
+                if progression is not None and box[6] in self.lanes and not progression.is_unlocked(box[6]):
+                    continue
+                yield box
+
+    def ground(self, x, z, low, high, progression=None):
+        """Highest platform top under (x, z) between low and high, or None."""
+        best = None
+        for box in self.boxes_at(x, z, progression):
+            if low <= box[4] <= high and (best is None or box[4] > best):
+                best = box[4]
+        return best
+
+    def blocked(self, x, y, z, progression=None):
+        """Whether a player with feet at y would stand inside a platform too tall to step onto."""
+        return any(box[4] > y + STEP_HEIGHT and box[1] < y + PLAYER_HEIGHT
+                   for box in self.boxes_at(x, z, progression))
+
+
+class PlayerSim:
+    """One player's physics and lane timer state.
+
+    Subscribers are called as ``callback(event, **details)`` for ``'started'``
+    (lane), ``'finished'`` (lane, time), ``'respawned'`` (position) and
+    ``'entered'``/``'exited'`` (zone).
+    """
+
+    def __init__(self, world, progression=None):
+        self.world = world
+        self.progression = progression or Progression(world.level.lanes)
+        self.position = list(world.spawn)
+        self.previous = tuple(self.position)   # position before the last step, for rendering
+        self.velocity = [0.0, 0.0]             # horizontal x, z
+        self.velocity_y = 0.0
+        self.grounded = False
+        self.can_jump = True
+        self.checkpoint = tuple(world.spawn)
+        self.clock = 0.0
+        self.lane_started = None
+        self.timer_start = 0.0
+        self.inside = set()
+        self.listeners = []
+
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+        return callback
+
+    def emit(self, event, **details):
+        for callback in list(self.listeners):
+            callback(event, **details)
+
+    def step(self, inp, dt=TIMESTEP):
+        self.previous = tuple(self.position)
+        self.clock += dt
+        self._move(inp, dt)
+        self._fall(inp, dt)
+
+        if self.position[1] < RESPAWN_Y:
+            self.position = list(self.checkpoint)
+            self.velocity = [0.0, 0.0]
+            self.velocity_y = 0.0
+            self.grounded = False
+            self.emit('respawned', position=self.checkpoint)
+
+        self._check_zones()
+
+    def _move(self, inp, dt):
+        move_x, move_z = inp.move_x, inp.move_z
+        length = math.hypot(move_x, move_z)
+        if length > 1:
+            move_x, move_z = move_x / length, move_z / length
+        forward_x, forward_z = math.sin(math.radians(inp.yaw)), math.cos(math.radians(inp.yaw))
+        target_x = (forward_z * move_x + forward_x * move_z) * ACCELERATION
+        target_z = (-forward_x * move_x + forward_z * move_z) * ACCELERATION
+
+        vx, vz = self.velocity
+        blend = min(dt * RESPONSIVENESS, 1)
+        vx += (target_x - vx) * blend
+        vz += (target_z - vz) * blend
+        if not length:
+            keep = 1 - min(dt * FRICTION, 1)
+            vx, vz = vx * keep, vz * keep
+
+        x, y, z = self.position
+        new_x, new_z = x + vx * dt, z + vz * dt
+        blocked, progression = self.world.blocked, self.progression
+        if blocked(new_x, y, new_z, progression):
+            # Slide along whichever axis is still free
+            if not blocked(new_x, y, z, progression):
+                new_z, vz = z, 0.0
+            elif not blocked(x, y, new_z, progression):
+                new_x, vx = x, 0.0
+            else:
+                new_x, new_z, vx, vz = x, z, 0.0, 0.0
+        self.position[0], self.position[2] = new_x, new_z
+        self.velocity = [vx, vz]
+
+    def _fall(self, inp, dt):
+        x, y, z = self.position
+        if self.grounded:
+            if not inp.jump:
+                self.can_jump = True
+            elif self.can_jump:
+                self.velocity_y = JUMP_VELOCITY
+                self.grounded = False
+                self.can_jump = False
+
+        if self.grounded:
+            # Follow the ground, stepping up small ledges and walking off edges
+            top = self.world.ground(x, z, y - GROUND_SNAP, y + STEP_HEIGHT, self.progression)
+            if top is None:
+                self.grounded = False
+                self.velocity_y = 0.0
+            else:
+                self.position[1] = top
+            return
+
+        self.velocity_y = max(self.velocity_y - GRAVITY * dt, -MAX_FALL_SPEED)
+        new_y = y + self.velocity_y * dt
+        if self.velocity_y <= 0:
+            top = self.world.ground(x, z, new_y, y + STEP_HEIGHT, self.progression)
+            if top is not None:
+                new_y = top
+                self.velocity_y = 0.0
+                self.grounded = True
+        self.position[1] = new_y
+
+    def _check_zones(self):
+        self.inside, exited, entered = self.world.triggers.update(*self.position, inside=self.inside, player=self)
+        for zone in exited:
+            self.emit('exited', zone=zone)
+        for zone in entered:
+            self._enter_zone(zone)
+            self.emit('entered', zone=zone)
+
+    def _enter_zone(self, zone):
+        kind, lane = zone.data['kind'], zone.data['lane']
+        if kind == 'checkpoint':
+            self.checkpoint = zone.data['checkpoint']
+        elif lane != self.progression.current():
+            return
+        elif kind == 'finish':
+            self.stop_timer()
+            self.progression.complete(lane)
+            self.checkpoint = zone.data['checkpoint']
+        elif kind == 'start' and self.lane_started is None:
+            self.lane_started = lane
+            self.timer_start = self.clock
+            self.emit('started', lane=lane)
+
+    def stop_timer(self):
+        if self.lane_started is None:
+            return None
+        lane, elapsed = self.lane_started, round(self.clock - self.timer_start, 2)
+        self.lane_started = None
+        self.emit('finished', lane=lane, time=elapsed)
+        return elapsed
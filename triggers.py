@@ -0,0 +1,66 @@
+"""Axis-aligned trigger volumes looked up through a spatial hash.
+
+Zones are registered in every cell their box overlaps, so checking a point only
+looks at the zones in that point's cell, however many zones the level has.
+"""
+import math
+
+
+class Zone:
+    def __init__(self, center, size, on_enter=None, on_exit=None, **data):
+        self.min = tuple(c - s / 2 for c, s in zip(center, size))
+        self.max = tuple(c + s / 2 for c, s in zip(center, size))
+        self.on_enter = on_enter
+        self.on_exit = on_exit
+        self.data = data
+
+    def contains(self, x, y, z):
+        return (self.min[0] <= x <= self.max[0] and
+                self.min[1] <= y <= self.max[1] and
+                self.min[2] <= z <= self.max[2])
+
+
+class TriggerSystem:
+    def __init__(self, cell_size=8):
+        self.cell_size = cell_size
+        self.cells = {}      # (cx, cy, cz) -> list of zones
+        self.inside = set()  # zones containing the last point passed to update()
+
+    def _cell(self, x, y, z):
+        size = self.cell_size
+        return (math.floor(x / size), math.floor(y / size), math.floor(z / size))
+
+    def add(self, zone):
+        lo = self._cell(*zone.min)
+        hi = self._cell(*zone.max)
+        for cx in range(lo[0], hi[0] + 1):
+            for cy in range(lo[1], hi[1] + 1):
+                for cz in range(lo[2], hi[2] + 1):
+                    self.cells.setdefault((cx, cy, cz), []).append(zone)
+        return zone
+
+    def zones_at(self, x, y, z):
+        return {zone for zone in self.cells.get(self._cell(x, y, z), ()) if zone.contains(x, y, z)}
+
+    def update(self, x, y, z, inside=None, **details):
+        """Move a tracked point and fire exit/enter callbacks for zones it crossed.
+
+        The system tracks one point itself. When several share it, such as players
+        in one World, each passes the zones it was in last time as `inside`.
+        Callbacks get the zone plus `details`. Returns (inside, exited, entered).
+        """
+        previous = self.inside if inside is None else inside
+        now = self.zones_at(x, y, z)
+        if inside is None:
+            self.inside = now
+        if now == previous:
+            return now, set(), set()
+        exited = previous - now
+        entered = now - previous
+        for zone in exited:
+            if zone.on_exit:
+                zone.on_exit(zone, **details)
+        for zone in entered:
+            if zone.on_enter:
+                zone.on_enter(zone, **details)
+        return now, exited, entered